@@ -0,0 +1,73 @@
+import asyncio
+import inspect
+from functools import partial
+
+from .XLSXWriter import Writer
+
+
+async def write_to_sink(sink, data):
+    result = sink.write(data)
+    if inspect.isawaitable(result):
+        await result
+
+    drain = getattr(sink, 'drain', None)
+    if drain is not None:
+        await drain()
+
+
+class AsyncWriter:
+    ROWS_BATCH_SIZE = 1024
+
+    def __init__(self, writer=None, executor=None, batch_size=ROWS_BATCH_SIZE):
+        self.writer = writer if writer is not None else Writer()
+        self.executor = executor
+        self.batch_size = batch_size
+
+    async def _run(self, function, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, partial(function, *args, **kwargs))
+
+    async def sheetAdd(self, sheet_name, col_widths=(), freeze_rows=False, freeze_columns=False):
+        await self._run(self.writer.sheetAdd, sheet_name, col_widths, freeze_rows, freeze_columns)
+
+    async def writeSheetHeader(self, header_types, col_options={}):
+        await self._run(self.writer.writeSheetHeader, header_types, col_options)
+
+    async def writeSheetRow(self, row, styles=None, row_options=None):
+        await self._run(self.writer.writeSheetRow, row, styles, row_options)
+
+    async def writeSheetRows(self, rows, styles=None, row_options=None):
+        if not hasattr(rows, '__aiter__'):
+            return await self._run(self.writer.writeSheetRows, rows, styles, row_options)
+
+        pending = None
+        batch = []
+        async for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                if pending is not None:
+                    await pending
+                pending = asyncio.ensure_future(self._run(self.writer.writeSheetRows, batch, styles, row_options))
+                batch = []
+
+        if pending is not None:
+            await pending
+        if batch:
+            await self._run(self.writer.writeSheetRows, batch, styles, row_options)
+
+    async def writeSheetColumns(self, columns, styles=None, row_options=None, column_types=None):
+        await self._run(self.writer.writeSheetColumns, columns, styles, row_options, column_types)
+
+    async def iterBytes(self, chunk_size=65536):
+        chunks = self.writer.iterBytes(chunk_size)
+        while True:
+            chunk = await self._run(next, chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+
+    async def writeToStream(self, sink, chunk_size=65536):
+        async for chunk in self.iterBytes(chunk_size):
+            await write_to_sink(sink, chunk)
+
+    async def saveAs(self, filename=None):
+        await self._run(self.writer.saveAs, filename)
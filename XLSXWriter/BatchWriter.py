@@ -0,0 +1,77 @@
+import json
+import multiprocessing
+import os
+import time
+import traceback
+
+from .XLSXWriter import Writer, WorkbookTemplate, SpooledSheetStorage
+
+MAX_TEMPLATES = 16
+
+_worker_options = {}
+_templates = {}
+
+
+def init_worker(options):
+    _worker_options.clear()
+    _worker_options.update(options)
+    _templates.clear()
+
+
+def template_writer(styles=None):
+    key = json.dumps(styles, sort_keys=True, default=str)
+    template = _templates.get(key)
+    if template is None:
+        writer = Writer()
+        writer.setSheetStorage(_worker_options.get('storage', SpooledSheetStorage), **_worker_options.get('storage_options', {}))
+        template = WorkbookTemplate(writer, styles)
+        if len(_templates) >= MAX_TEMPLATES:
+            _templates.clear()
+        _templates[key] = template
+
+    return template.newWriter()
+
+
+def run_job(indexed_job):
+    index, job = indexed_job
+    start = time.perf_counter()
+    result = {'index': index, 'output': job.get('output'), 'rows': 0, 'seconds': 0.0, 'error': None, 'pid': os.getpid()}
+    try:
+        writer = template_writer(job.get('styles'))
+        data = job['source'](*job.get('args', ()), **job.get('kwargs', {}))
+        sheets = data if isinstance(data, dict) else {job.get('sheet_name', 'Sheet1'): data}
+        for sheet_name, rows in sheets.items():
+            writer.sheetAdd(sheet_name, col_widths=job.get('col_widths', ()))
+            if job.get('header'):
+                writer.writeSheetRow(job['header'], styles=job.get('header_styles'))
+            writer.writeSheetRows(rows, styles=job.get('row_styles'))
+            result['rows'] += writer.countSheetRows(sheet_name)
+        writer.saveAs(job['output'])
+    except Exception:
+        result['error'] = traceback.format_exc()
+
+    result['seconds'] = time.perf_counter() - start
+
+    return result
+
+
+class BatchWriter:
+
+    def __init__(self, processes=None, max_tasks_per_child=1000, chunksize=8, storage=SpooledSheetStorage, storage_options=None):
+        self.processes = processes if processes is not None else (os.cpu_count() or 1)
+        self.max_tasks_per_child = max_tasks_per_child
+        self.chunksize = chunksize
+        self.options = {'storage': storage, 'storage_options': storage_options if storage_options is not None else {'max_size': 4194304}}
+
+    def run(self, jobs):
+        jobs = enumerate(jobs)
+        if self.processes == 0:
+            init_worker(self.options)
+            yield from map(run_job, jobs)
+            return
+
+        with multiprocessing.Pool(self.processes, init_worker, (self.options,), self.max_tasks_per_child) as pool:
+            yield from pool.imap_unordered(run_job, jobs, self.chunksize)
+
+    def runAll(self, jobs):
+        return sorted(self.run(jobs), key=lambda result: result['index'])
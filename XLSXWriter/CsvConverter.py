@@ -0,0 +1,144 @@
+import csv
+import os
+import re
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+
+from .XLSXWriter import Writer
+
+NUMBER_PATTERN = re.compile(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][-+]?\d+)?')
+DATE_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}')
+DATETIME_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}')
+MAX_SCALE = 6
+
+# every worker registers the same styles in the same order, so the converted sheets can be imported into one workbook
+STYLES = dict([
+    ('header', {'font-style': 'bold'}),
+    ('string', {'format': 'GENERAL'}),
+    ('integer', {'format': 'integer'}),
+    ('date', {'format': 'date'}),
+    ('datetime', {'format': 'datetime'}),
+] + [('decimal' + str(scale), {'format': '0.' + '0' * scale}) for scale in range(1, MAX_SCALE + 1)])
+
+
+def new_writer(tempdir=None):
+    writer = Writer()
+    if tempdir:
+        writer.setTempDir(tempdir)
+    writer.setStyles(STYLES)
+
+    return writer
+
+
+def infer_column_type(values):
+    values = [v for v in values if v != '']
+    if not values:
+        return 'string', None
+    if all(DATETIME_PATTERN.fullmatch(v) for v in values):
+        return 'datetime', DATETIME_PATTERN
+    if all(DATE_PATTERN.fullmatch(v) for v in values):
+        return 'date', DATE_PATTERN
+    if all(NUMBER_PATTERN.fullmatch(v) for v in values):
+        scale = max(len(v.partition('.')[2].partition('e')[0].partition('E')[0]) for v in values)
+        return ('decimal' + str(min(scale, MAX_SCALE)) if scale > 0 else 'integer'), NUMBER_PATTERN
+
+    return 'string', None
+
+
+def typed_rows(writer, rows, column_types, batch_size):
+    styles = [style for style, _ in column_types]
+    checks = [(c, pattern.fullmatch) for c, (_, pattern) in enumerate(column_types) if pattern is not None]
+    batch = []
+    for row in rows:
+        mismatched = [c for c, fullmatch in checks if c < len(row) and row[c] != '' and fullmatch(row[c]) is None]
+        if mismatched:
+            writer.writeSheetRows(batch, styles=styles)
+            batch = []
+            writer.writeSheetRow(row, styles=['string' if c in mismatched else style for c, style in enumerate(styles)])
+            continue
+
+        batch.append(row)
+        if len(batch) >= batch_size:
+            writer.writeSheetRows(batch, styles=styles)
+            batch = []
+
+    writer.writeSheetRows(batch, styles=styles)
+
+
+def convert_csv(job):
+    start = time.perf_counter()
+    writer = new_writer(job['tempdir'])
+    writer.setAppendable()
+    writer.sheetAdd(job['sheet_name'])
+
+    with open(job['input'], newline='', encoding=job['encoding']) as f:
+        rows = csv.reader(f, delimiter=job['delimiter'])
+        if job['header']:
+            header = next(rows, None)
+            if header is not None:
+                writer.writeSheetRow(header, styles='header')
+
+        sample = list(islice(rows, job['sample_rows']))
+        column_count = max(map(len, sample), default=0)
+        column_types = [infer_column_type([row[c] for row in sample if c < len(row)]) for c in range(column_count)]
+        typed_rows(writer, chain(sample, rows), column_types, job['batch_size'])
+
+    writer.saveAs(job['output'])
+
+    return {'input': job['input'], 'sheet_name': job['sheet_name'], 'output': job['output'], 'rows': writer.countSheetRows(job['sheet_name']),
+            'bytes': os.path.getsize(job['input']), 'types': [style for style, _ in column_types], 'seconds': time.perf_counter() - start}
+
+
+def sheet_names(inputs):
+    names = []
+    for filename in inputs:
+        base_name = Writer.sanitize_sheetname(os.path.splitext(os.path.basename(filename))[0])
+        name, number = base_name, 1
+        while name in names:
+            number += 1
+            suffix = ' (' + str(number) + ')'
+            name = base_name[:Writer.SHEET_NAME_LENGTH - len(suffix)] + suffix
+        names.append(name)
+
+    return names
+
+
+class CsvConverter:
+    SAMPLE_ROWS = 1000
+    BATCH_SIZE = 4096
+
+    def __init__(self, processes=None, sample_rows=SAMPLE_ROWS, delimiter=',', encoding='utf-8', header=True, tempdir=None):
+        self.processes = processes if processes is not None else (os.cpu_count() or 1)
+        self.sample_rows = sample_rows
+        self.delimiter = delimiter
+        self.encoding = encoding
+        self.header = header
+        self.tempdir = tempdir
+
+    def convert(self, inputs, output):
+        start = time.perf_counter()
+        directory = tempfile.mkdtemp(prefix='xlsx_convert_', dir=self.tempdir)
+        jobs = [{'input': filename, 'sheet_name': sheet_name, 'output': os.path.join(directory, str(i) + '.xlsx'), 'tempdir': self.tempdir,
+                 'sample_rows': self.sample_rows, 'batch_size': self.BATCH_SIZE, 'delimiter': self.delimiter, 'encoding': self.encoding, 'header': self.header}
+                for i, (filename, sheet_name) in enumerate(zip(inputs, sheet_names(inputs)))]
+
+        try:
+            if self.processes <= 1 or len(jobs) == 1:
+                results = list(map(convert_csv, jobs))
+            else:
+                with ProcessPoolExecutor(min(self.processes, len(jobs))) as executor:
+                    results = list(executor.map(convert_csv, jobs))
+
+            writer = new_writer(self.tempdir)
+            for result in results:
+                writer.sheetImport(result['output'], result['sheet_name'])
+            writer.saveAs(output)
+            del writer
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        return {'output': output, 'sheets': results, 'rows': sum(r['rows'] for r in results), 'bytes': sum(r['bytes'] for r in results),
+                'seconds': time.perf_counter() - start}
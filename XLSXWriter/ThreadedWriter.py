@@ -0,0 +1,91 @@
+import queue
+import threading
+
+from .XLSXWriter import Writer
+
+
+class ThreadedWriter:
+    QUEUE_SIZE = 64
+    MAX_PENDING = 256
+
+    def __init__(self, writer=None, queue_size=QUEUE_SIZE, timeout=None, max_pending=MAX_PENDING):
+        self.writer = writer if writer is not None else Writer()
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self.error = None
+        self._queue = queue.Queue(queue_size)
+        self._pending = {}
+        self._next_seq = {}
+        self._progress = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._serialize, name='xlsx-writer-serializer', daemon=True)
+        self._thread.start()
+
+    def submit(self, sheet_name, rows, seq=None, styles=None, row_options=None):
+        if self.error is not None:
+            raise self.error
+        if self._closed:
+            raise Exception("Error: " + "writer is closed.")
+
+        # only the serializer takes batches from the queue, so a batch too far ahead waits here until the gap is written
+        if seq is not None and self.max_pending is not None:
+            with self._progress:
+                if not self._progress.wait_for(lambda: self.error is not None or seq < self._next_seq.get(sheet_name, 0) + self.max_pending, self.timeout):
+                    raise Exception("Error: " + "batch " + str(seq) + " of sheet " + sheet_name + " is more than " + str(self.max_pending) + " batches ahead of batch " + str(self._next_seq.get(sheet_name, 0)) + ".")
+            if self.error is not None:
+                raise self.error
+
+        self._queue.put((sheet_name, rows, seq, styles, row_options), timeout=self.timeout)
+
+    def _serialize(self):
+        while True:
+            batch = self._queue.get()
+            if batch is None:
+                return
+
+            if self.error is None:
+                try:
+                    self._writeBatch(*batch)
+                except Exception as e:
+                    with self._progress:
+                        self.error = e
+                        self._progress.notify_all()
+
+    def _writeBatch(self, sheet_name, rows, seq, styles, row_options):
+        if seq is None:
+            return self._writeRows(sheet_name, rows, styles, row_options)
+
+        pending = self._pending.setdefault(sheet_name, {})
+        next_seq = self._next_seq.get(sheet_name, 0)
+        if seq < next_seq or seq in pending:
+            raise Exception("Error: " + "batch " + str(seq) + " of sheet " + sheet_name + " submitted twice.")
+
+        pending[seq] = (rows, styles, row_options)
+        while next_seq in pending:
+            self._writeRows(sheet_name, *pending.pop(next_seq))
+            next_seq += 1
+
+        with self._progress:
+            self._next_seq[sheet_name] = next_seq
+            self._progress.notify_all()
+
+    def _writeRows(self, sheet_name, rows, styles, row_options):
+        self.writer.setActiveSheet(sheet_name)
+        self.writer.writeSheetRows(rows, styles, row_options)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+
+        if self.error is not None:
+            raise self.error
+
+        for sheet_name, pending in self._pending.items():
+            if pending:
+                raise Exception("Error: " + "sheet " + sheet_name + " is missing batch " + str(self._next_seq.get(sheet_name, 0)) + ".")
+
+    def saveAs(self, filename=None):
+        self.close()
+        self.writer.saveAs(filename)
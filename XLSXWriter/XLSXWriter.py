@@ -1,13 +1,35 @@
+import io
 import os
 import time
 import random
 import re
+import shutil
+import struct
+import sys
 import tempfile
 import zipfile
+import zlib
 import json
+import math
 import copy
-from functools import reduce
-from collections import OrderedDict
+import datetime
+import decimal
+from array import array
+from bisect import bisect_right
+from functools import reduce, lru_cache
+from collections import Counter, OrderedDict
+from itertools import chain, islice, repeat
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+XML_CONTROL_CHARS_TABLE = {c: ' ' for c in list(range(32)) + [127] if c not in (9, 10, 13)}
+XML_CONTROL_CHARS_PATTERN = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]')
+XML_SPECIAL_CHARS_PATTERN = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\x7f&"\'<>\n]')
 
 
 def html_special_chars(text):
@@ -20,12 +42,242 @@ def html_special_chars(text):
         .replace("\n", "&#10;")
 
 
+def xml_escape(text, search=XML_SPECIAL_CHARS_PATTERN.search):
+    if search(text) is None:
+        return text
+
+    if XML_CONTROL_CHARS_PATTERN.search(text) is not None:
+        text = text.translate(XML_CONTROL_CHARS_TABLE)
+
+    return html_special_chars(text)
+
+
+def deflate_chunks(chunks, dst_filename, level=zlib.Z_DEFAULT_COMPRESSION, mode=zlib.Z_FINISH):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    crc = file_size = compress_size = 0
+    with open(dst_filename, 'wb') as dst:
+        for block in chunks:
+            crc = zlib.crc32(block, crc)
+            file_size += len(block)
+            data = compressor.compress(block)
+            compress_size += len(data)
+            dst.write(data)
+
+        data = compressor.flush(mode)
+        compress_size += len(data)
+        dst.write(data)
+
+    return crc, file_size, compress_size
+
+
+def deflate_file(src_filename, dst_filename, level=zlib.Z_DEFAULT_COMPRESSION, block_size=1048576):
+    return deflate_chunks(read_blocks(src_filename, block_size), dst_filename, level)
+
+
+def _gf2_matrix_times(mat, vec):
+    result = 0
+    i = 0
+    while vec:
+        if vec & 1:
+            result ^= mat[i]
+        vec >>= 1
+        i += 1
+
+    return result
+
+
+def _gf2_matrix_multiply(a, b):
+    return [_gf2_matrix_times(a, column) for column in b]
+
+
+@lru_cache(maxsize=16)
+def _crc32_zeros_operator(length):
+    op = [0xedb88320] + [1 << n for n in range(31)]  # one zero bit
+    for _ in range(3):
+        op = _gf2_matrix_multiply(op, op)             # one zero byte
+
+    result = [1 << n for n in range(32)]
+    while length:
+        if length & 1:
+            result = _gf2_matrix_multiply(op, result)
+        length >>= 1
+        if length:
+            op = _gf2_matrix_multiply(op, op)
+
+    return result
+
+
+def crc32_combine(crc1, crc2, length2):
+    if length2 <= 0:
+        return crc1
+
+    return _gf2_matrix_times(_crc32_zeros_operator(length2), crc1) ^ crc2
+
+
+def _deflate_block(block, zdict, is_last, level):
+    if zdict:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, zlib.DEF_MEM_LEVEL, zlib.Z_DEFAULT_STRATEGY, zdict)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    data = compressor.compress(block) + compressor.flush(zlib.Z_FINISH if is_last else zlib.Z_SYNC_FLUSH)
+
+    return zlib.crc32(block), data
+
+
+def deflate_file_threaded(src_filename, dst_filename, threads=None, level=zlib.Z_DEFAULT_COMPRESSION, block_size=1048576):
+    threads = threads or os.cpu_count() or 1
+    crc = file_size = compress_size = 0
+    pending = []
+    with open(src_filename, 'rb') as src, open(dst_filename, 'wb') as dst, ThreadPoolExecutor(threads) as executor:
+        zdict = b''
+        block = src.read(block_size)
+        while True:
+            next_block = src.read(block_size)
+            pending.append((len(block), executor.submit(_deflate_block, block, zdict, not next_block, level)))
+            zdict = block[-32768:]
+
+            while pending and (len(pending) > threads * 2 or not next_block):
+                length, future = pending.pop(0)
+                block_crc, data = future.result()
+                crc = crc32_combine(crc, block_crc, length)
+                file_size += length
+                compress_size += len(data)
+                dst.write(data)
+
+            if not next_block:
+                break
+            block = next_block
+
+    return crc, file_size, compress_size
+
+
+def zip_write_raw(zip, arcname, chunks, crc, file_size, compress_size):
+    zinfo = zipfile.ZipInfo(arcname, time.localtime(time.time())[:6])
+    zinfo.compress_type = zipfile.ZIP_DEFLATED
+    zinfo.external_attr = 0o600 << 16
+    zinfo.CRC = crc
+    zinfo.file_size = file_size
+    zinfo.compress_size = compress_size
+    zip64 = file_size > zipfile.ZIP64_LIMIT or compress_size > zipfile.ZIP64_LIMIT
+
+    if zip._writing:
+        raise ValueError("Can't write to the ZIP file while there is another write handle open on it.")
+
+    if zip._seekable:
+        zip.fp.seek(zip.start_dir)
+    zinfo.header_offset = zip.fp.tell()
+    zip._writecheck(zinfo)
+    zip._didModify = True
+    zip.fp.write(zinfo.FileHeader(zip64))
+
+    for chunk in chunks:
+        zip.fp.write(chunk)
+        yield
+
+    zip.start_dir = zip.fp.tell()
+    zip.filelist.append(zinfo)
+    zip.NameToInfo[zinfo.filename] = zinfo
+
+
+def read_blocks(filename, block_size=65536):
+    with open(filename, 'rb') as f:
+        block = f.read(block_size)
+        while block:
+            yield block
+            block = f.read(block_size)
+
+
+def limit_chunks(chunks, size):
+    for block in chunks:
+        if size <= 0:
+            return
+        yield block[:size]
+        size -= len(block)
+
+
+def zip_read_raw(zip, zinfo, offset=0, length=None, block_size=65536):
+    zip.fp.seek(zinfo.header_offset)
+    header = zip.fp.read(zipfile.sizeFileHeader)
+    if header[:4] != zipfile.stringFileHeader:
+        raise Exception("Error: " + "bad local file header of " + zinfo.filename + ".")
+
+    name_length, extra_length = struct.unpack('<HH', header[26:30])
+    position = zinfo.header_offset + zipfile.sizeFileHeader + name_length + extra_length + offset
+    remaining = zinfo.compress_size - offset if length is None else length
+    while remaining > 0:
+        zip.fp.seek(position)
+        block = zip.fp.read(min(block_size, remaining))
+        if not block:
+            raise Exception("Error: " + "unexpected end of " + zinfo.filename + ".")
+        position += len(block)
+        remaining -= len(block)
+        yield block
+
+
+APPEND_STATE_PART = 'xl/appendState.json'
+
+EXCEL_EPOCH_ORDINAL = datetime.date(1899, 12, 30).toordinal()
+DATE_PATTERN = re.compile(r'(\d{4})-(\d{2})-(\d{2})')
+TIME_PATTERN = re.compile(r'(\d{2}):(\d{2}):(\d{2})')
+
+
+def excel_days(date):
+    if date.year < 1900:
+        return 0
+
+    days = date.toordinal() - EXCEL_EPOCH_ORDINAL
+    if days < 61:
+        days -= 1   # Excel counts the non-existent 1900-02-29
+
+    return days
+
+
+@lru_cache(maxsize=65536)
+def convert_date_string(date_time):
+    seconds = 0
+    year = month = day = 0
+
+    if date_time[4:5] == '-' and date_time[7:8] == '-' and date_time[:4].isdecimal() and date_time[5:7].isdecimal() and date_time[8:10].isdecimal():
+        year, month, day = int(date_time[:4]), int(date_time[5:7]), int(date_time[8:10])
+        hms = date_time[11:13] + date_time[14:16] + date_time[17:19]
+        if date_time[10:11] in (' ', 'T') and date_time[13:14] == ':' and date_time[16:17] == ':' and len(hms) == 6 and hms.isdecimal():
+            seconds = (int(date_time[11:13]) * 3600 + int(date_time[14:16]) * 60 + int(date_time[17:19])) / 86400
+            time_parsed = True
+        else:
+            time_parsed = len(date_time) <= 10
+    else:
+        time_parsed = False
+        matches = DATE_PATTERN.search(date_time)
+        if matches:
+            (year, month, day) = map(int, matches.groups())
+
+    if not time_parsed:
+        matches = TIME_PATTERN.search(date_time)
+        if matches:
+            (hour, _min, sec) = map(int, matches.groups())
+            seconds = (hour * 3600 + _min * 60 + sec) / 86400
+
+    if (year, month, day) in ((1899, 12, 31), (1900, 1, 0)):
+        return seconds
+    if (year, month, day) == (1900, 2, 29):
+        return seconds + 60
+
+    if year < 1900 or year > 9999:
+        return 0
+
+    try:
+        return excel_days(datetime.date(year, month, day)) + seconds
+    except ValueError:
+        return 0
+
+
 class BuffererWriter:
 
     def __init__(self, filename, fd_fopen_flags='w', buffer_size=400):
-        self.fd = open(filename, fd_fopen_flags)
+        self.fd = open(filename, fd_fopen_flags, encoding='utf-8') if isinstance(filename, str) else filename
         self.buffer_size = buffer_size
         self.buffer = ""
+        self.flush_count = 0
         if self.fd == False:
             raise Exception("Unable to open $filename for writing.")
 
@@ -41,6 +293,7 @@ class BuffererWriter:
         if self.fd:
             self.fd.write(self.buffer)
             self.buffer = ""
+            self.flush_count += 1
 
     def close(self):
         self.purge()
@@ -62,10 +315,641 @@ class BuffererWriter:
 
         return -1
 
+    def discard(self):
+        self.buffer = ""
+        if isinstance(self.fd, io.IOBase):
+            self.fd.close()
+        self.fd = None
+
+
+class FilePool:
+
+    def __init__(self, max_open=256):
+        self.max_open = max_open
+        self.files = OrderedDict()
+
+    def acquire(self, storage):
+        if storage in self.files:
+            self.files.move_to_end(storage)
+            return
+
+        while len(self.files) >= self.max_open:
+            self.files.popitem(last=False)[0].release()
+        self.files[storage] = True
+
+    def discard(self, storage):
+        self.files.pop(storage, None)
+
+
+class FileSheetStorage:
+    deflated = False
+    mode = 'a'
+    encoding = 'utf-8'
+
+    def __init__(self, tempdir=None, pool=None):
+        fd, self.filename = tempfile.mkstemp(prefix="xlsx_writer_", dir=tempdir)
+        os.close(fd)
+        self.pool = pool
+        self.fd = None
+
+    def _open(self):
+        if self.pool is not None:
+            self.pool.acquire(self)
+        self.fd = open(self.filename, self.mode, encoding=self.encoding)
+
+    def write(self, text):
+        if self.fd is None:
+            self._open()
+        elif self.pool is not None:
+            self.pool.acquire(self)
+        self.fd.write(text)
+
+    def release(self):
+        if self.fd:
+            self.fd.close()
+            self.fd = None
+        if self.pool is not None:
+            self.pool.discard(self)
+
+    def close(self):
+        self.release()
+
+    def mark(self):
+        if self.fd:
+            self.fd.flush()
+
+        return self.size()
+
+    def size(self):
+        return os.path.getsize(self.filename)
+
+    def chunks(self, block_size=65536):
+        return read_blocks(self.filename, block_size)
+
+    def remove(self):
+        self.release()
+        if os.path.exists(self.filename):
+            os.unlink(self.filename)
+
+
+class SpooledSheetStorage(FileSheetStorage):
+    mode = 'ab'
+    encoding = None
+    filename = None
+
+    def __init__(self, tempdir=None, max_size=16777216, pool=None):
+        self.tempdir = tempdir
+        self.max_size = max_size
+        self.pool = pool
+        self.fd = None
+        self.buffer = io.BytesIO()
+        self.file_size = 0
+
+    def write(self, text):
+        data = text.encode('utf-8')
+        self.file_size += len(data)
+        if self.buffer is not None:
+            self.buffer.write(data)
+            if self.file_size <= self.max_size:
+                return
+
+            # rolled over to a named file, so the pool can close it and reopen it for appending like any sheet file
+            data = self.buffer.getvalue()
+            self.buffer = None
+            fd, self.filename = tempfile.mkstemp(prefix="xlsx_writer_", dir=self.tempdir)
+            os.close(fd)
+        FileSheetStorage.write(self, data)
+
+    def size(self):
+        return self.file_size
+
+    def chunks(self, block_size=65536):
+        if self.buffer is None:
+            return FileSheetStorage.chunks(self, block_size)
+
+        data = self.buffer.getvalue()
+        return (data[i:i + block_size] for i in range(0, len(data), block_size))
+
+    def remove(self):
+        self.buffer = None
+        if self.filename is not None:
+            FileSheetStorage.remove(self)
+
+
+class DeflatedSheetStorage(FileSheetStorage):
+    deflated = True
+    mode = 'ab'
+    encoding = None
+
+    def __init__(self, tempdir=None, level=zlib.Z_DEFAULT_COMPRESSION, pool=None):
+        FileSheetStorage.__init__(self, tempdir, pool)
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        self.crc = self.file_size = self.compress_size = 0
+
+    def write(self, text):
+        data = text.encode('utf-8')
+        self.crc = zlib.crc32(data, self.crc)
+        self.file_size += len(data)
+        data = self.compressor.compress(data)
+        if data:
+            self.compress_size += len(data)
+            FileSheetStorage.write(self, data)
+
+    def close(self):
+        if self.compressor is not None:
+            data = self.compressor.flush()
+            self.compress_size += len(data)
+            FileSheetStorage.write(self, data)
+            self.compressor = None
+        self.release()
+
+    def mark(self):
+        data = self.compressor.flush(zlib.Z_SYNC_FLUSH)
+        self.compress_size += len(data)
+        FileSheetStorage.write(self, data)
+
+        return self.crc, self.file_size, self.compress_size
+
+    def size(self):
+        return self.file_size
+
+
+class ZipEntryWriter:
+
+    def __init__(self, zip, arcname, prologue=''):
+        self.zip = zip
+        self.arcname = arcname
+        self.prologue = prologue
+        self.fd = None
+
+    def isPending(self):
+        return self.fd is None
+
+    def _open(self):
+        self.fd = io.TextIOWrapper(self.zip.open(self.arcname, 'w', force_zip64=True), encoding='utf-8', newline='')
+        self.fd.write(self.prologue)
+        self.prologue = ''
+
+    def write(self, text):
+        if self.fd is None:
+            self._open()
+        self.fd.write(text)
+
+    def close(self):
+        if self.fd is None:
+            if self.zip.fp is None:
+                return
+            self._open()
+        self.fd.close()
+
+
+class ChunkSink:
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        self.size = 0
+        return data
+
+
+class WriterStats:
+    # timed per call, so the hook gets them once per sheet on finalize instead of millions of times
+    SHEET_PHASES = ('escape', 'date_conversion')
+
+    def __init__(self, hook=None):
+        self.hook = hook
+        self.timers = {}
+        self.cells = Counter()
+        self.sheets = {}
+
+    def add(self, phase, seconds):
+        self.timers[phase] = self.timers.get(phase, 0.0) + seconds
+        if self.hook is not None:
+            self.hook(self, phase, seconds)
+
+    def timed(self, phase, function, sheet_name):
+        timers = self.timers
+        sheet_stats = self.sheet(sheet_name)
+        perf_counter = time.perf_counter
+
+        def wrapper(*args):
+            start = perf_counter()
+            result = function(*args)
+            seconds = perf_counter() - start
+            timers[phase] = timers.get(phase, 0.0) + seconds
+            sheet_stats[phase] += seconds
+            return result
+
+        return wrapper
+
+    def finishSheet(self, sheet_name):
+        sheet_stats = self.sheet(sheet_name)
+        if self.hook is not None:
+            for phase in self.SHEET_PHASES:
+                self.hook(self, phase, sheet_stats[phase])
+
+    def countRows(self, rows):
+        update = self.cells.update
+        for row in rows:
+            update(map(type, row))
+            yield row
+
+    def countColumns(self, columns):
+        for values in columns:
+            if numpy is not None and isinstance(values, numpy.ndarray):
+                self.cells[values.dtype.type] += len(values)
+            else:
+                self.cells.update(map(type, values))
+
+    def sheet(self, sheet_name):
+        if sheet_name not in self.sheets:
+            self.sheets[sheet_name] = {'rows': 0, 'flush_count': 0, 'file_size': 0, 'compress_size': 0, 'escape': 0.0, 'date_conversion': 0.0}
+
+        return self.sheets[sheet_name]
+
+    def asDict(self):
+        return {
+            'timers': dict(self.timers),
+            'cells': {t.__name__: n for t, n in self.cells.items()},
+            'sheets': {name: dict(sheet) for name, sheet in self.sheets.items()},
+        }
+
+
+class SharedStrings:
+
+    def __init__(self, max_count=65536, max_length=255, min_frequency=1, max_candidates=65536):
+        self.max_count = max_count
+        self.max_length = max_length
+        self.min_frequency = min_frequency
+        self.max_candidates = max_candidates
+        self.strings = []
+        self.index = {}
+        self.candidates = OrderedDict()
+        self.count = 0
+
+    def lookup(self, value):
+        idx = self.index.get(value)
+        if idx is not None:
+            self.count += 1
+            return idx
+
+        if len(value) > self.max_length or len(self.strings) >= self.max_count:
+            return None
+
+        if self.min_frequency > 1:
+            seen = self.candidates.pop(value, 0) + 1
+            if seen < self.min_frequency:
+                self.candidates[value] = seen
+                if len(self.candidates) > self.max_candidates:
+                    self.candidates.popitem(last=False)
+                return None
+
+        idx = len(self.strings)
+        self.index[value] = idx
+        self.strings.append(Writer.xmlspecialchars(value))
+        self.count += 1
+
+        return idx
+
+    def buildXML(self):
+        sst_xml = ['<?xml version="1.0" encoding="UTF-8" standalone="yes"?>' + "\n"]
+        sst_xml.append('<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" count="' + str(self.count) + '" uniqueCount="' + str(len(self.strings)) + '">')
+        for text in self.strings:
+            if text[:1].isspace() or text[-1:].isspace():
+                sst_xml.append('<si><t xml:space="preserve">' + text + '</t></si>')
+            else:
+                sst_xml.append('<si><t>' + text + '</t></si>')
+        sst_xml.append('</sst>')
+
+        return ''.join(sst_xml)
+
+
+@lru_cache(maxsize=65536)
+def encoded_column(column_number, cell_style_idx, num_format_type):
+    style_attr = '" s="' + str(cell_style_idx) + '"'
+
+    return '<c r="' + Writer.xlsCell(0, column_number)[:-1], style_attr, num_format_type, style_attr + ' t="n"><v>' if num_format_type == 'n_auto' else None
+
+
+def dataframe_values(values):
+    # Excel has no time zones, tz-aware datetimes are written as naive UTC
+    if getattr(values.dtype, 'tz', None) is not None:
+        values = values.dt.tz_convert('UTC').dt.tz_localize(None) if hasattr(values, 'dt') else values.tz_convert('UTC').tz_localize(None)
+
+    # missing values of nullable string/Int64/boolean columns are pd.NA, which can't be compared, so they become None by mask
+    missing = numpy.asarray(values.isna())
+    if not missing.any():
+        return values.to_numpy()
+    if not isinstance(values.dtype, numpy.dtype):
+        return values.to_numpy(dtype=object, na_value=None)
+
+    array = values.to_numpy()
+    if array.dtype.kind == 'O':
+        array = array.copy()
+        array[missing] = None
+
+    return array
+
+
+class MergedCells:
+    BLOCK_SIZE = 1024
+
+    def __init__(self, ranges=()):
+        self.ranges = array('I')
+        self.columns = {}
+        for i in range(0, len(ranges), 4):
+            self.add(*ranges[i:i + 4])
+
+    def __len__(self):
+        return len(self.ranges) // 4
+
+    def __iter__(self):
+        ranges = self.ranges
+        return (ranges[i:i + 4] for i in range(0, len(ranges), 4))
+
+    def add(self, row1, col1, row2, col2):
+        # merged ranges are disjoint, so the row intervals of every column are sorted and disjoint too. they are kept in blocks
+        # of at most 2 * BLOCK_SIZE, an insert is two bisects and a bounded move instead of shifting the whole column
+        positions = []
+        for c in range(col1, col2 + 1):
+            column = self.columns.get(c)
+            if column is None:
+                column = self.columns[c] = ([], [], [])
+            firsts, starts, ends = column
+            b = bisect_right(firsts, row2) - 1 if firsts and firsts[-1] > row2 else len(firsts) - 1
+            if b < 0:
+                i = 0
+            else:
+                i = bisect_right(starts[b], row2) if starts[b][-1] > row2 else len(starts[b])
+                if ends[b][i - 1] >= row1:
+                    raise Exception("Error: " + "merged range " + Writer.xlsCell(row1, col1) + ":" + Writer.xlsCell(row2, col2) + " overlaps another merged range.")
+            positions.append((column, max(b, 0), i))
+
+        for (firsts, starts, ends), b, i in positions:
+            if not starts:
+                firsts.append(row1)
+                starts.append(array('I', (row1,)))
+                ends.append(array('I', (row2,)))
+                continue
+
+            starts[b].insert(i, row1)
+            ends[b].insert(i, row2)
+            if i == 0:
+                firsts[b] = row1
+            if len(starts[b]) > 2 * self.BLOCK_SIZE:
+                starts.insert(b + 1, starts[b][self.BLOCK_SIZE:])
+                ends.insert(b + 1, ends[b][self.BLOCK_SIZE:])
+                del starts[b][self.BLOCK_SIZE:]
+                del ends[b][self.BLOCK_SIZE:]
+                firsts.insert(b + 1, starts[b + 1][0])
+        self.ranges.extend((row1, col1, row2, col2))
+
+
+class RowEncoder:
+    ROW_TAG = '<row collapsed="false" customFormat="0" customHeight="false" hidden="false" ht="12.1" outlineLevel="0" r="'
+
+    def __init__(self, cell_styles=(), default_style=(0, 'n_auto'), shared_strings=None, escape=xml_escape, convert_date=None, spans=False, widths=None):
+        self.cell_styles = list(cell_styles)
+        self.default_style = default_style
+        self.shared_strings = shared_strings
+        self.escape = escape
+        self.convert_date = convert_date
+        self.spans = spans
+        self.widths = widths
+        self.columns = []
+
+    def _extend(self, cell_count):
+        if cell_count > Writer.EXCEL_2007_MAX_COL:
+            raise Exception("Error: " + "row has " + str(cell_count) + " cells, the limit is " + str(Writer.EXCEL_2007_MAX_COL) + ".")
+
+        for c in range(len(self.columns), cell_count):
+            cell_style_idx, num_format_type = self.cell_styles[c] if c < len(self.cell_styles) else self.default_style
+            self.columns.append(encoded_column(c, cell_style_idx, num_format_type))
+
+    @staticmethod
+    def rowTag(row_options=None):
+        if row_options is None:
+            return RowEncoder.ROW_TAG
+
+        ht = float(row_options['height']) if 'height' in row_options else 12.1
+        customHt = 'true' if 'height' in row_options else 'false'
+        hidden = 'true' if row_options.get('hidden', False) else 'false'
+        collapsed = int(row_options.get('collapsed', 0))
+
+        return '<row collapsed="' + ('true' if collapsed > 0 else 'false') + '" customFormat="0" customHeight="' + customHt + '" hidden="' + hidden + '" ht="' + str(
+            ht) + '" outlineLevel="' + str(collapsed) + '" r="'
+
+    @staticmethod
+    def encodeString(cell_ref, style_attr, value, shared_strings=None, escape=xml_escape):
+        if type(value) is not str:
+            return cell_ref + style_attr + ' t="inlineStr"><is><t>' + Writer.xmlspecialchars(value) + '</t></is></c>'
+
+        if shared_strings is not None:
+            idx = shared_strings.lookup(value)
+            if idx is not None:
+                return cell_ref + style_attr + ' t="s"><v>' + str(idx) + '</v></c>'
+
+        return cell_ref + style_attr + ' t="inlineStr"><is><t>' + escape(value) + '</t></is></c>'
+
+    @staticmethod
+    def encodeCell(cell_ref, style_attr, value, num_format_type, shared_strings=None, escape=xml_escape, convert_date=None):
+        if value == '' or value is None:
+            return cell_ref + style_attr + '/>'
+        elif type(value) is bool or (numpy is not None and type(value) is numpy.bool_):
+            return cell_ref + style_attr + ' t="b"><v>' + ('1' if value else '0') + '</v></c>'
+        elif (type(value) is float and not math.isfinite(value)) or (type(value) is decimal.Decimal and not value.is_finite()):
+            return cell_ref + style_attr + '/>'   # Excel has no NaN or infinity
+        elif num_format_type == 'n_auto':
+            if type(value) in (int, float):
+                return cell_ref + style_attr + ' t="n"><v>' + str(value) + '</v></c>'
+            return RowEncoder.encodeString(cell_ref, style_attr, value, shared_strings, escape)
+        elif type(value) == str and value[:1] == '=':
+            return cell_ref + style_attr + ' t="s"><f>' + escape(value) + '</f></c>'
+        elif num_format_type == 'n_date' or num_format_type == 'n_datetime':
+            return cell_ref + style_attr + ' t="n"><v>' + str((convert_date or Writer.convert_date_time)(value)) + '</v></c>'
+        elif num_format_type == 'n_numeric':
+            return cell_ref + style_attr + ' t="n"><v>' + Writer.xmlspecialchars(value) + '</v></c>'
+        elif num_format_type == 'n_string':
+            return RowEncoder.encodeString(cell_ref, style_attr, value, shared_strings, escape)
+
+        return ''
+
+    def encodeRow(self, row_number, row, row_tag=ROW_TAG):
+        columns = self.columns
+        if len(row) > len(columns):
+            self._extend(len(row))
+
+        if self.widths is not None:
+            self._measureRow(row)
+
+        rs = str(row_number + 1)
+        parts = [row_tag, rs, '" spans="1:' + str(len(row)) + '">' if self.spans and row else '">']
+        append = parts.append
+        encodeCell = self.encodeCell
+        shared_strings = self.shared_strings
+        escape = self.escape
+        convert_date = self.convert_date
+        isfinite = math.isfinite
+
+        for (cell_ref, style_attr, num_format_type, number_attr), value in zip(columns, row):
+            if number_attr is not None and (type(value) is int or (type(value) is float and isfinite(value))):
+                append(cell_ref + rs + number_attr + str(value) + '</v></c>')
+            elif value is None:
+                append(cell_ref + rs + style_attr + '/>')
+            else:
+                append(encodeCell(cell_ref + rs, style_attr, value, num_format_type, shared_strings, escape, convert_date))
+
+        append('</row>')
+
+        return ''.join(parts)
+
+    def encodeCells(self, row_number, cells, row_tag=ROW_TAG):
+        if self.widths is not None:
+            self._measureCells(cells)
+
+        rs = str(row_number + 1)
+        parts = [row_tag, rs, '" spans="1:' + str(cells[-1][0] + 1) + '">' if self.spans and cells else '">']
+        append = parts.append
+        encodeCell = self.encodeCell
+        shared_strings = self.shared_strings
+        escape = self.escape
+        convert_date = self.convert_date
+        isfinite = math.isfinite
+
+        for c, (value, cell_style) in cells:
+            cell_ref, style_attr, num_format_type, number_attr = encoded_column(c, *cell_style)
+            if number_attr is not None and (type(value) is int or (type(value) is float and isfinite(value))):
+                append(cell_ref + rs + number_attr + str(value) + '</v></c>')
+            elif value is None:
+                append(cell_ref + rs + style_attr + '/>')
+            else:
+                append(encodeCell(cell_ref + rs, style_attr, value, num_format_type, shared_strings, escape, convert_date))
+
+        append('</row>')
+
+        return ''.join(parts)
+
+    def _measureRow(self, row):
+        widths = self.widths
+        if len(row) > len(widths):
+            widths.extend([0] * (len(row) - len(widths)))
+
+        for c, value in enumerate(row):
+            if value is not None:
+                width = len(value) if type(value) is str else len(str(value))
+                if width > widths[c]:
+                    widths[c] = width
+
+    def _measureCells(self, cells):
+        widths = self.widths
+        if cells[-1][0] >= len(widths):
+            widths.extend([0] * (cells[-1][0] + 1 - len(widths)))
+
+        for c, (value, _) in cells:
+            if value is not None:
+                width = len(value) if type(value) is str else len(str(value))
+                if width > widths[c]:
+                    widths[c] = width
+
+    def _measureColumns(self, columns):
+        widths = self.widths
+        if len(columns) > len(widths):
+            widths.extend([0] * (len(columns) - len(widths)))
+
+        for c, values in enumerate(columns):
+            if numpy is not None and isinstance(values, numpy.ndarray):
+                values = values.tolist()
+            width = max((len(value) if type(value) is str else len(str(value)) for value in values if value is not None), default=0)
+            if width > widths[c]:
+                widths[c] = width
+
+    def _encodeColumn(self, c, row_strings, values):
+        cell_ref, style_attr, num_format_type, number_attr = self.columns[c]
+        shared_strings = self.shared_strings
+        escape = self.escape
+        convert_date = self.convert_date
+        mask = None
+
+        if numpy is not None and isinstance(values, numpy.ndarray) and values.dtype.kind == 'b':
+            return [cell_ref + rs + style_attr + ' t="b"><v>' + v + '</v></c>' for rs, v in zip(row_strings, map(str, values.astype(numpy.int8).tolist()))]
+
+        if numpy is not None and isinstance(values, numpy.ndarray) and values.dtype.kind in 'iufM':
+            if values.dtype.kind == 'M':
+                mask = numpy.isnat(values)
+                serials = (values - numpy.datetime64('1899-12-30')) / numpy.timedelta64(1, 'D')
+                values = numpy.where(serials < 61, serials - 1, serials)
+                number_attr = style_attr + ' t="n"><v>'
+            elif values.dtype.kind == 'f':
+                mask = ~numpy.isfinite(values)
+
+            if number_attr is None and num_format_type == 'n_numeric':
+                number_attr = style_attr + ' t="n"><v>'
+
+            if number_attr is not None:
+                cells = [cell_ref + rs + number_attr + v + '</v></c>' for rs, v in zip(row_strings, map(str, values.tolist()))]
+                if mask is not None and mask.any():
+                    for i in numpy.flatnonzero(mask).tolist():
+                        cells[i] = cell_ref + row_strings[i] + style_attr + '/>'
+                return cells
+
+            values = values.tolist()
+
+        cells = []
+        append = cells.append
+        encodeCell = self.encodeCell
+        isfinite = math.isfinite
+        for rs, value in zip(row_strings, values):
+            if number_attr is not None and (type(value) is int or (type(value) is float and isfinite(value))):
+                append(cell_ref + rs + number_attr + str(value) + '</v></c>')
+            elif value is None:
+                append(cell_ref + rs + style_attr + '/>')
+            else:
+                append(encodeCell(cell_ref + rs, style_attr, value, num_format_type, shared_strings, escape, convert_date))
+
+        return cells
+
+    def encodeColumns(self, row_number, columns, row_tag=ROW_TAG):
+        if len(columns) > len(self.columns):
+            self._extend(len(columns))
+
+        row_count = len(columns[0]) if columns else 0
+        if self.widths is not None:
+            self._measureColumns(columns)
+
+        row_strings = [str(r + 1) for r in range(row_number, row_number + row_count)]
+        row_close = '" spans="1:' + str(len(columns)) + '">' if self.spans and columns else '">'
+        row_opens = [row_tag + rs + row_close for rs in row_strings]
+        cells = [self._encodeColumn(c, row_strings, values) for c, values in enumerate(columns)]
+
+        return ''.join(map(''.join, zip(row_opens, *cells, repeat('</row>', row_count))))
+
 
 class Writer:
-    EXCEL_2007_MAX_ROW = 1048570    # todo - не совсем так
-    EXCEL_2007_MAX_COL = 256        # todo - не совсем так
+    EXCEL_2007_MAX_ROW = 1048576
+    EXCEL_2007_MAX_COL = 16384
+    SHEET_NAME_LENGTH = 30
+    ROWS_CHUNK_LENGTH = 262144
+    CURSOR_BATCH_SIZE = 4096
+    CELL_WINDOW_ROWS = 1024
+    COLUMNS_BLOCK_SIZE = 4096
+    COLUMNS_BLOCK_CELLS = 65536
+    MAX_ENCODERS = 256
+    MAX_OPEN_FILES = 256
+    COPY_BLOCK_SIZE = 65536
+    APPEND_SHEET_KEYS = ('sheetname', 'xmlname', 'row_count', 'max_row', 'max_column', 'col_widths', 'auto_widths', 'auto_filter', 'freeze_rows', 'freeze_columns',
+                         'merge_cells', 'tab_selected')
 
     def __init__(self, buffer_size=1024):
         self._buffer_size = buffer_size
@@ -80,16 +964,52 @@ class Writer:
         self._tempdir = ""
         self._temp_files = []
         self._cell_styles = []
+        self._cell_styles_index = {}
+        self._cell_style_types = []
+        self._style_indexes = []
         self._number_formats = []
+        self._number_formats_index = {}
+        self._fills = ['', '']
+        self._fills_index = {'': 0}
+        self._fonts = ['', '', '', '']
+        self._fonts_index = {'': 0}
+        self._borders = ['']
+        self._borders_index = {'': 0}
         self._styles = {}
+        self._zip = None
+        self._shared_strings = None
+        self._compress_processes = 0
+        self._compress_threads = 0
+        self._compress_block_size = 1048576
+        self._sheet_storage = (FileSheetStorage, {})
+        self._file_pool = FilePool(self.MAX_OPEN_FILES)
+        self._escape = xml_escape
+        self._stats = None
+        self._row_spans = False
+        self._auto_fit = None
+        self._template = None
+        self._appendable = False
+        self._append_zip = None
+        self._sources = []
+        self._rollover = None
+        self._continued_sheets = {}
+        self._cell_window = self.CELL_WINDOW_ROWS
 
         self.__addCellStyle(number_format='GENERAL', cell_style_string='')
 
     def __del__(self):
+        for sheet in self._sheets.values():
+            if sheet['storage'] is not None:
+                sheet['file_writer'].discard()
+                sheet['storage'].remove()
+
         for f in self._temp_files:
             if os.path.exists(f):
                 os.unlink(f)
 
+        for source in self._sources:
+            source.close()
+
     def setTitle(self, title=''):
         self._title = title
 
@@ -111,74 +1031,495 @@ class Writer:
     def setTempDir(self, tempdir=''):
         self._tempdir = tempdir
 
+    def setSharedStrings(self, max_count=65536, max_length=255, min_frequency=1, max_candidates=65536):
+        if len(self._sheets) > 0:
+            raise Exception("Error: " + "shared strings must be enabled before any worksheet is added.")
+        if self._appendable:
+            raise Exception("Error: " + "appendable workbooks can't use shared strings.")
+
+        self._shared_strings = SharedStrings(max_count, max_length, min_frequency, max_candidates)
+
+    def setEscapeCache(self, max_size=4096):
+        self._escape = lru_cache(maxsize=max_size)(xml_escape) if max_size else xml_escape
+        for sheet in self._sheets.values():
+            sheet['encoders'].clear()
+
+    def setRowSpans(self, enabled=True):
+        self._row_spans = enabled
+        for sheet in self._sheets.values():
+            sheet['encoders'].clear()
+
+    def setAutoFitColumns(self, min_width=8.43, max_width=60):
+        if len(self._sheets) > 0:
+            raise Exception("Error: " + "auto-fit must be enabled before any worksheet is added.")
+        if max_width and self._zip is not None:
+            raise Exception("Error: " + "auto-fit can't be used while streaming, the column widths are written before the rows.")
+
+        self._auto_fit = (min_width, max_width) if max_width else None
+
+    def setSheetRollover(self, enabled=True, header_rows=1):
+        if len(self._sheets) > 0:
+            raise Exception("Error: " + "sheet rollover must be enabled before any worksheet is added.")
+
+        self._rollover = header_rows if enabled else None
+
+    def setCellWindow(self, rows=CELL_WINDOW_ROWS):
+        self._cell_window = rows
+
+    def setAppendable(self, enabled=True):
+        if len(self._sheets) > 0:
+            raise Exception("Error: " + "appendable mode must be enabled before any worksheet is added.")
+        if enabled and (self._zip is not None or self._shared_strings is not None):
+            raise Exception("Error: " + "appendable workbooks can't be streamed or use shared strings.")
+
+        self._appendable = enabled
+
+    def openForAppend(self, filename):
+        if len(self._sheets) > 0 or self._zip is not None:
+            raise Exception("Error: " + "a workbook must be opened before any worksheet is added.")
+        if self._shared_strings is not None:
+            raise Exception("Error: " + "appendable workbooks can't use shared strings.")
+
+        source, state = self._openSource(filename)
+        self._title, self._subject, self._author = state['title'], state['subject'], state['author']
+        self._company, self._description, self._keywords = state['company'], state['description'], state['keywords']
+        self._auto_fit = tuple(state['auto_fit']) if state['auto_fit'] else None
+        self._appendable = True
+        self._append_zip = source
+
+        for sheet in state['sheets'][:-1]:
+            self._sheets[sheet['sheetname']] = dict(sheet, filename=None, storage=None, file_writer=None, columns=[], encoders={}, header_rows=[], cells={}, finalized=True,
+                                                    source=source, source_xmlname=sheet['xmlname'], merge_cells=MergedCells(sheet['merge_cells']))
+
+        sheet = state['sheets'][-1]
+        self.sheetAdd(sheet['sheetname'], sheet['col_widths'], sheet['freeze_rows'], sheet['freeze_columns'])
+        self._sheets[sheet['sheetname']].update(sheet, source=source, source_xmlname=sheet['xmlname'], segments=state['segments'], merge_cells=MergedCells(sheet['merge_cells']))
+
+    def sheetImport(self, filename, sheet_name=None):
+        if self._zip is not None:
+            raise Exception("Error: " + "worksheets can't be imported while streaming.")
+
+        source, state = self._openSource(filename)
+        sheet = state['sheets'][-1]
+        sheet_name = sheet_name if sheet_name else sheet['sheetname']
+        self.sheetAdd(sheet_name, sheet['col_widths'], sheet['freeze_rows'], sheet['freeze_columns'])
+
+        imported = self._sheets[sheet_name]
+        imported['file_writer'].discard()
+        imported['storage'].remove()
+        imported.update({key: sheet[key] for key in ('row_count', 'max_row', 'max_column', 'auto_filter')}, merge_cells=MergedCells(sheet['merge_cells']),
+                        filename=None, storage=None, file_writer=None, finalized=True, source=source, source_xmlname=sheet['xmlname'], segments=state['segments'])
+        if imported['auto_widths'] is not None:
+            imported['auto_widths'] = sheet['auto_widths'] or []
+        self._current_sheet = ""
+
+    def _openSource(self, filename):
+        source = zipfile.ZipFile(filename)
+        if APPEND_STATE_PART not in source.NameToInfo:
+            source.close()
+            raise Exception("Error: " + "workbook was not saved with setAppendable().")
+
+        state = json.loads(source.read(APPEND_STATE_PART).decode('utf-8'))
+        if state['segments'] is None:
+            source.close()
+            raise Exception("Error: " + "the last worksheet of the workbook can't be reopened.")
+
+        for cell_style_idx, lookup_string in enumerate(state['cell_styles']):
+            number_format_idx, cell_style_string = lookup_string.split(';', 1)
+            if self.__addCellStyle(state['number_formats'][int(number_format_idx)], cell_style_string) != cell_style_idx:
+                source.close()
+                raise Exception("Error: " + "cell styles of the workbook don't match the styles of the writer.")
+        for name, value in state['styles'].items():
+            self._styles[name] = tuple(value) if isinstance(value[0], int) else [tuple(v) for v in value]
+
+        self._sources.append(source)
+
+        return source, state
+
+    def enableStats(self, hook=None):
+        self._stats = WriterStats(hook)
+        for sheet in self._sheets.values():
+            sheet['encoders'].clear()
+
+        return self._stats
+
+    def getStats(self):
+        return self._stats
+
+    def setCompressProcesses(self, processes=None):
+        self._compress_processes = processes if processes is not None else (os.cpu_count() or 1)
+
+    def setCompressThreads(self, threads=None, block_size=1048576):
+        self._compress_threads = threads if threads is not None else (os.cpu_count() or 1)
+        self._compress_block_size = block_size
+
+    def setSheetStorage(self, storage_class, **options):
+        self._sheet_storage = (storage_class, options)
+
+    def setMaxOpenFiles(self, max_open=MAX_OPEN_FILES):
+        self._file_pool.max_open = max_open
+
     def _tempFilename(self):
         tempdir = self._tempdir if self._tempdir else tempfile.gettempdir()
-        filename = tempdir + "/xlsx_writer_" + str(random.randint(1, 1000))
+        fd, filename = tempfile.mkstemp(prefix="xlsx_writer_", dir=tempdir)
+        os.close(fd)
         self._temp_files.append(filename)
 
         return filename
 
+    def streamTo(self, target):
+        if self._zip is not None or len(self._sheets) > 0:
+            raise Exception("Error: " + "streaming must be started before any worksheet is added.")
+        if self._appendable:
+            raise Exception("Error: " + "appendable workbooks can't be streamed.")
+        if self._auto_fit is not None:
+            raise Exception("Error: " + "auto-fit can't be used while streaming, the column widths are written before the rows.")
+
+        self._zip = zipfile.ZipFile(target, 'w', zipfile.ZIP_DEFLATED, allowZip64=True)
+
+    def close(self):
+        if self._zip is None:
+            return 0
+
+        if self._stats is not None:
+            start = time.perf_counter()
+
+        for sheet in self._sheets:
+            self._finalizeSheet(sheet)
+
+        if len(self._sheets) == 0:
+            raise Exception("Error: " + " no worksheets defined.")
+
+        self._writeDocumentParts(self._zip)
+        self._writeWorkbookParts(self._zip)
+        self._zip.close()
+        self._zip = None
+
+        if self._stats is not None:
+            self._stats.add('save', time.perf_counter() - start)
+
     def writeToStdOut(self):
-        temp_file = self._tempFilename()
-        self.writeToFile(temp_file)
-        open(temp_file, 'r').read()
+        self.writeToStream(sys.stdout.buffer)
+        sys.stdout.buffer.flush()
 
     def writeToString(self):
-        temp_file = self._tempFilename()
-        self.writeToFile(temp_file)
-        return open(temp_file).read()
-
-    def saveAs(self, filename):
-        self.writeSheetRow([])
-        self.writeToFile(filename)
+        output = io.BytesIO()
+        self.writeToStream(output)
+        return output.getvalue()
+
+    def writeToStream(self, stream):
+        for _ in self._iterZip(stream):
+            pass
+
+    def iterBytes(self, chunk_size=65536):
+        sink = ChunkSink()
+        for _ in self._iterZip(sink):
+            if sink.size >= chunk_size:
+                yield sink.drain()
+
+        if sink.size > 0:
+            yield sink.drain()
+
+    def saveAs(self, filename=None):
+        if not self._appendable and self.countSheetRows() < self.EXCEL_2007_MAX_ROW:
+            self.writeSheetRow([])
+        if self._zip is not None:
+            self.close()
+        else:
+            self.writeToFile(filename)
 
     def sheetAdd(self, sheet_name, col_widths=(), freeze_rows=False, freeze_columns=False):
         self._initializeSheet(sheet_name, col_widths, freeze_rows, freeze_columns)
         self._current_sheet = sheet_name
 
+    def sheetClose(self, sheet_name=''):
+        sheet_name = sheet_name if sheet_name else self._current_sheet
+        if sheet_name not in self._sheets:
+            return 0
+
+        self._finalizeSheet(sheet_name)
+        self._sheets[sheet_name]['encoders'] = {}
+        if sheet_name == self._current_sheet:
+            self._current_sheet = ""
+
     def setActiveSheet(self, sheet_name):
-        self.sheetAdd(sheet_name)
+        sheet_name = self._continued_sheets.get(sheet_name, sheet_name)
+        if sheet_name not in self._sheets:
+            return self.sheetAdd(sheet_name)
+        if self._sheets[sheet_name]['finalized']:
+            raise Exception("Error: " + "sheet '" + str(sheet_name) + "' is closed.")
+
+        self._current_sheet = sheet_name
 
     def writeToFile(self, filename):
+        if not os.path.exists(filename):
+            for _ in self._iterZip(filename):
+                pass
+            return
+
+        if not os.access(filename, os.W_OK):
+            raise Exception("Error: " + "file is not writeable.")
+
+        self._replaceFile(filename)
+
+    def _replaceFile(self, filename):
+        # the existing file stays untouched until the new one is complete, it may also be the workbook being appended to
+        fd, temp_filename = tempfile.mkstemp(prefix="xlsx_writer_", dir=os.path.dirname(os.path.abspath(filename)))
+        os.close(fd)
+        try:
+            for _ in self._iterZip(temp_filename):
+                pass
+            shutil.copymode(filename, temp_filename)
+        except BaseException:
+            os.unlink(temp_filename)
+            raise
+
+        if self._append_zip is not None and os.path.samefile(filename, self._append_zip.filename):
+            self._append_zip.close()
+            self._append_zip = None
+        os.replace(temp_filename, filename)
+
+    def _iterZip(self, target):
+        if self._zip is not None:
+            raise Exception("Error: " + "writer is streaming, use close() instead.")
+        if any('source' in sheet and sheet['source'].fp is None for sheet in self._sheets.values()):
+            raise Exception("Error: " + "the source workbook was replaced, open it again.")
+
+        if self._stats is not None:
+            save_start = time.perf_counter()
+
         for sheet in self._sheets:
             self._finalizeSheet(sheet)
 
-        if os.path.exists(filename):
-            if os.access(filename, os.W_OK):
-                os.unlink(filename)
-            else:
-                raise Exception("Error: " + "file is not writeable.")
-
         if len(self._sheets) == 0:
             raise Exception("Error: " + " no worksheets defined.")
 
-        zip = zipfile.ZipFile(filename, 'w', zipfile.ZIP_DEFLATED)
-        zip.writestr("docProps/app.xml", self._buildAppXML())
+        compressed = []
+        if self._compress_processes > 0 and len(self._sheets) > 1 and not self._appendable and all(
+                self._sheets[sheet]['filename'] and not self._sheets[sheet]['storage'].deflated for sheet in self._sheets):
+            executor = ProcessPoolExecutor(min(self._compress_processes, len(self._sheets)))
+            for sheet in self._sheets:
+                deflated_filename = self._tempFilename()
+                compressed.append((deflated_filename, executor.submit(deflate_file, self._sheets[sheet]['filename'], deflated_filename)))
+            executor.shutdown(wait=False)
+
+        zip = zipfile.ZipFile(target, 'w', zipfile.ZIP_DEFLATED, allowZip64=True)
+        try:
+            self._writeDocumentParts(zip)
+            yield
+
+            segments = None
+            last_sheet = next(reversed(self._sheets))
+            for i, sheet in enumerate(self._sheets):
+                if self._stats is not None:
+                    start = time.perf_counter()
+
+                if 'segments' in self._sheets[sheet] or (self._appendable and sheet == last_sheet and self._sheets[sheet]['storage'] is not None):
+                    sheet_segments = yield from self._iterZipSegmentedSheet(zip, self._sheets[sheet])
+                    segments = sheet_segments if sheet == last_sheet else None
+                elif self._sheets[sheet]['storage'] is None:
+                    yield from self._iterZipSourceSheet(zip, self._sheets[sheet])
+                else:
+                    yield from self._iterZipSheet(zip, self._sheets[sheet], compressed[i] if compressed else None)
+
+                if self._stats is not None:
+                    self._stats.add('compress', time.perf_counter() - start)
+
+            self._writeWorkbookParts(zip)
+            if self._appendable:
+                zip.writestr(APPEND_STATE_PART, self._appendState(segments))
+            zip.close()
+            if self._stats is not None:
+                self._stats.add('save', time.perf_counter() - save_start)
+            yield
+        finally:
+            # also runs when the caller abandons iterBytes(), the pool may still be writing the deflated sheets
+            for deflated_filename, future in compressed:
+                if not future.cancel():
+                    future.exception()
+                if os.path.exists(deflated_filename):
+                    os.unlink(deflated_filename)
+
+    def _iterZipSheet(self, zip, sheet, compressed=None):
+        storage = sheet['storage']
+        arcname = "xl/worksheets/" + sheet['xmlname']
+        prologue = self._buildSheetPrologue(sheet, self._sheetDimension(sheet)).encode('utf-8')
+        deflated_filename = None
+
+        if storage.deflated:
+            chunks = storage.chunks(self.COPY_BLOCK_SIZE)
+            crc, file_size, compress_size = storage.crc, storage.file_size, storage.compress_size
+        elif compressed:
+            deflated_filename, future = compressed
+            crc, file_size, compress_size = future.result()
+        elif self._compress_threads > 0 and storage.filename and storage.size() > self._compress_block_size:
+            deflated_filename = self._tempFilename()
+            crc, file_size, compress_size = deflate_file_threaded(storage.filename, deflated_filename, self._compress_threads, block_size=self._compress_block_size)
+        else:
+            zinfo = zipfile.ZipInfo(arcname, time.localtime(time.time())[:6])
+            zinfo.compress_type = zipfile.ZIP_DEFLATED
+            zinfo.file_size = len(prologue) + storage.size()
+            with zip.open(zinfo, 'w') as dest:
+                dest.write(prologue)
+                for block in storage.chunks(self.COPY_BLOCK_SIZE):
+                    dest.write(block)
+                    yield
+            yield
+            return
+
+        if deflated_filename is not None:
+            chunks = read_blocks(deflated_filename, self.COPY_BLOCK_SIZE)
+
+        prologue_crc, deflated_prologue = _deflate_block(prologue, None, False, zlib.Z_DEFAULT_COMPRESSION)
+        try:
+            for _ in zip_write_raw(zip, arcname, chain([deflated_prologue], chunks), crc32_combine(prologue_crc, crc, file_size),
+                                   len(prologue) + file_size, len(deflated_prologue) + compress_size):
+                yield
+        finally:
+            if deflated_filename is not None and os.path.exists(deflated_filename):
+                os.unlink(deflated_filename)
+
+    def _iterZipSourceSheet(self, zip, sheet):
+        zinfo = sheet['source'].getinfo("xl/worksheets/" + sheet['source_xmlname'])
+        yield from zip_write_raw(zip, "xl/worksheets/" + sheet['xmlname'], zip_read_raw(sheet['source'], zinfo, block_size=self.COPY_BLOCK_SIZE),
+                                 zinfo.CRC, zinfo.file_size, zinfo.compress_size)
+
+    def _iterZipSegmentedSheet(self, zip, sheet):
+        storage = sheet['storage']
+        arcname = "xl/worksheets/" + sheet['xmlname']
+        prologue = self._buildSheetPrologue(sheet, self._sheetDimension(sheet)).encode('utf-8')
+        prologue_crc, deflated_prologue = _deflate_block(prologue, None, False, zlib.Z_DEFAULT_COMPRESSION)
+        deflated_filename = None
+
+        # worksheet entry is prologue | rows | epilogue, rows end on a sync flush and can be copied raw on the next append
+        if storage is None:
+            crc, file_size, compress_size, chunks = 0, 0, 0, ()
+        elif storage.deflated:
+            crc, file_size, compress_size = sheet['body_mark']
+            chunks = limit_chunks(storage.chunks(self.COPY_BLOCK_SIZE), compress_size)
+        else:
+            deflated_filename = self._tempFilename()
+            crc, file_size, compress_size = deflate_chunks(limit_chunks(storage.chunks(self.COPY_BLOCK_SIZE), sheet['body_mark']), deflated_filename,
+                                                           mode=zlib.Z_SYNC_FLUSH)
+            chunks = read_blocks(deflated_filename, self.COPY_BLOCK_SIZE)
+
+        if 'segments' in sheet:
+            segments = sheet['segments']
+            source_chunks = zip_read_raw(sheet['source'], sheet['source'].getinfo("xl/worksheets/" + sheet['source_xmlname']), segments['prologue'], segments['body'],
+                                         self.COPY_BLOCK_SIZE)
+            chunks = chain(source_chunks, chunks)
+            crc = crc32_combine(segments['crc'], crc, file_size)
+            file_size += segments['size']
+            compress_size += segments['body']
+
+        epilogue = self._buildSheetEpilogue(sheet).encode('utf-8')
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS)
+        deflated_epilogue = compressor.compress(epilogue) + compressor.flush()
+
+        try:
+            for _ in zip_write_raw(zip, arcname, chain([deflated_prologue], chunks, [deflated_epilogue]),
+                                   crc32_combine(crc32_combine(prologue_crc, crc, file_size), zlib.crc32(epilogue), len(epilogue)),
+                                   len(prologue) + file_size + len(epilogue), len(deflated_prologue) + compress_size + len(deflated_epilogue)):
+                yield
+        finally:
+            if deflated_filename is not None:
+                os.unlink(deflated_filename)
+
+        return {'prologue': len(deflated_prologue), 'body': compress_size, 'crc': crc, 'size': file_size}
+
+    def _appendState(self, segments):
+        state = {
+            'title': self._title,
+            'subject': self._subject,
+            'author': self._author,
+            'company': self._company,
+            'description': self._description,
+            'keywords': self._keywords,
+            'auto_fit': self._auto_fit,
+            'number_formats': self._number_formats,
+            'cell_styles': self._cell_styles,
+            'styles': self._styles,
+            'sheets': [dict({key: sheet[key] for key in self.APPEND_SHEET_KEYS}, merge_cells=sheet['merge_cells'].ranges.tolist()) for sheet in self._sheets.values()],
+            'segments': segments
+        }
+
+        return json.dumps(state, separators=(',', ':'))
+
+    def _sheetDimension(self, sheet):
+        if sheet['max_row'] == 0 or sheet['max_column'] == 0:
+            return 'A1'
+
+        max_cell = self.xlsCell(sheet['max_row'] - 1, sheet['max_column'] - 1)
+
+        return 'A1:' + max_cell if max_cell != 'A1' else 'A1'
+
+    def _writePart(self, zip, arcname, text):
+        if self._template is None:
+            return zip.writestr(arcname, text)
+
+        crc, file_size, data = self._template.deflatePart(text)
+        for _ in zip_write_raw(zip, arcname, (data,), crc, file_size, len(data)):
+            pass
+
+    def _writeDocumentParts(self, zip):
+        self._writePart(zip, "docProps/app.xml", self._buildAppXML())
         zip.writestr("docProps/core.xml", self._buildCoreXML())
-        zip.writestr("_rels/.rels", self._buildRelationshipsXML())
-        for sheet in self._sheets:
-            zip.write(self._sheets[sheet]['filename'], "xl/worksheets/" + self._sheets[sheet]['xmlname'])
+        self._writePart(zip, "_rels/.rels", self._buildRelationshipsXML())
+
+    def _writeWorkbookParts(self, zip):
+        self._writePart(zip, "xl/workbook.xml", self._buildWorkbookXML())
+        if self._stats is not None:
+            start = time.perf_counter()
+            self._writePart(zip, "xl/styles.xml", self._stylesXML())
+            self._stats.add('styles_xml', time.perf_counter() - start)
+        else:
+            self._writePart(zip, "xl/styles.xml", self._stylesXML())
+        if self._shared_strings is not None:
+            zip.writestr("xl/sharedStrings.xml", self._shared_strings.buildXML())
+        self._writePart(zip, "[Content_Types].xml", self._buildContentTypesXML())
+        self._writePart(zip, "xl/_rels/workbook.xml.rels", self._buildWorkbookRelsXML())
+
+        if self._stats is not None:
+            for sheet in self._sheets.values():
+                info = zip.getinfo("xl/worksheets/" + sheet['xmlname'])
+                sheet_stats = self._stats.sheet(sheet['sheetname'])
+                sheet_stats['file_size'] = info.file_size
+                sheet_stats['compress_size'] = info.compress_size
+
+    def _stylesXML(self):
+        if self._template is not None and len(self._cell_styles) == self._template.style_count:
+            return self._template.styles_xml
 
-        zip.writestr("xl/workbook.xml", self._buildWorkbookXML())
-        zip.write(self._writeStylesXML(), "xl/styles.xml")
-        zip.writestr("[Content_Types].xml", self._buildContentTypesXML())
-        zip.writestr("xl/_rels/workbook.xml.rels", self._buildWorkbookRelsXML())
-        zip.close()
+        return self._writeStylesXML()
 
     def _initializeSheet(self, sheet_name, col_widths=(), freeze_rows=False, freeze_columns=False):
+        if self._zip is not None:
+            self._streamSheetCheck(sheet_name)
 
-        sheet_filename = self._tempFilename()
         sheet_xmlname = 'sheet' + str(len(self._sheets) + 1) + ".xml"
+        if sheet_name in self._sheets:
+            sheet_xmlname = self._sheets[sheet_name]['xmlname']
+            if self._sheets[sheet_name]['file_writer'] is not None:
+                self._sheets[sheet_name]['file_writer'].discard()
+            if self._sheets[sheet_name]['storage'] is not None:
+                self._sheets[sheet_name]['storage'].remove()
+
         self._sheets[sheet_name] = {
-            'filename': sheet_filename,
+            'filename': None,
+            'storage': None,
             'sheetname': sheet_name,
             'xmlname': sheet_xmlname,
             'row_count': 0,
-            'file_writer': BuffererWriter(sheet_filename, buffer_size=self._buffer_size),
+            'file_writer': None,
             'columns': [],
-            'merge_cells': [],
-            'max_cell_tag_start': 0,
-            'max_cell_tag_end': 0,
+            'encoders': {},
+            'merge_cells': MergedCells(),
+            'header_rows': [],
+            'cells': {},
+            'max_row': 0,
+            'max_column': 0,
+            'col_widths': list(col_widths),
+            'auto_widths': [] if self._auto_fit is not None else None,
             'auto_filter': None,
             'freeze_rows': freeze_rows,
             'freeze_columns': freeze_columns,
@@ -186,69 +1527,133 @@ class Writer:
         }
 
         sheet = self._sheets[sheet_name]
-        tabselected = 'true' if len(self._sheets) == 1 else 'false'
-        max_cell = self.xlsCell(self.EXCEL_2007_MAX_ROW, self.EXCEL_2007_MAX_COL)
-        sheet['file_writer'].write('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>' + "\n")
-        sheet['file_writer'].write(
-            '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">')
-        sheet['file_writer'].write('<sheetPr filterMode="false">')
-        sheet['file_writer'].write('<pageSetUpPr fitToPage="false"/>')
-        sheet['file_writer'].write('</sheetPr>')
-        sheet['max_cell_tag_start'] = sheet['file_writer'].ftell()
-        sheet['file_writer'].write('<dimension ref="A1:' + str(max_cell) + '"/>')
-        sheet['max_cell_tag_end'] = sheet['file_writer'].ftell()
-        sheet['file_writer'].write('<sheetViews>')
-        sheet['file_writer'].write(
-            '<sheetView colorId="64" defaultGridColor="true" rightToLeft="false" showFormulas="false" showGridLines="true" showOutlineSymbols="true" showRowColHeaders="true" showZeros="true" tabSelected="' + tabselected + '" topLeftCell="A1" view="normal" windowProtection="false" workbookViewId="0" zoomScale="100" zoomScaleNormal="100" zoomScalePageLayoutView="100">')
+        sheet['tab_selected'] = 'true' if len(self._sheets) == 1 else 'false'
+        if self._zip is not None:
+            sheet['file_writer'] = BuffererWriter(ZipEntryWriter(self._zip, "xl/worksheets/" + sheet_xmlname, self._buildSheetPrologue(sheet)),
+                                                  buffer_size=self._buffer_size)
+        else:
+            storage_class, options = self._sheet_storage
+            sheet['storage'] = storage_class(tempdir=self._tempdir or None, pool=self._file_pool, **options)
+            sheet['filename'] = sheet['storage'].filename
+            sheet['file_writer'] = BuffererWriter(sheet['storage'], buffer_size=self._buffer_size)
+
+    def _buildSheetPrologue(self, sheet, dimension=None):
+        sheet_xml = ""
+        sheet_xml += '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>' + "\n"
+        sheet_xml += '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        sheet_xml += '<sheetPr filterMode="false">'
+        sheet_xml += '<pageSetUpPr fitToPage="false"/>'
+        sheet_xml += '</sheetPr>'
+        if dimension is not None:
+            sheet_xml += '<dimension ref="' + dimension + '"/>'
+        sheet_xml += '<sheetViews>'
+        sheet_xml += '<sheetView colorId="64" defaultGridColor="true" rightToLeft="false" showFormulas="false" showGridLines="true" showOutlineSymbols="true" showRowColHeaders="true" showZeros="true" tabSelected="' + sheet['tab_selected'] + '" topLeftCell="A1" view="normal" windowProtection="false" workbookViewId="0" zoomScale="100" zoomScaleNormal="100" zoomScalePageLayoutView="100">'
 
         if sheet['freeze_rows'] and sheet['freeze_columns']:
-            sheet['file_writer'].write(
-                '<pane ySplit="' + str(sheet['freeze_rows']) + '" xSplit="' + str(sheet['freeze_columns']) + '" topLeftCell="' + self.xlsCell(sheet['freeze_rows'], sheet[
-                    'freeze_columns']) + '" activePane="bottomRight" state="frozen"/>')
-            sheet['file_writer'].write(
-                '<selection activeCell="' + self.xlsCell(sheet['freeze_rows'], 0) + '" activeCellId="0" pane="topRight" sqref="' + self.xlsCell(sheet['freeze_rows'], 0) + '"/>')
-            sheet['file_writer'].write('<selection activeCell="' + self.xlsCell(0, sheet['freeze_columns']) + '" activeCellId="0" pane="bottomLeft" sqref="' + self.xlsCell(0,
-                                                                                                                                                                            sheet[
-                                                                                                                                                                                'freeze_columns']) + '"/>')
-            sheet['file_writer'].write(
-                '<selection activeCell="' + self.xlsCell(sheet['freeze_rows'], sheet['freeze_columns']) + '" activeCellId="0" pane="bottomRight" sqref="' + self.xlsCell(
-                    sheet['freeze_rows'], sheet['freeze_columns']) + '"/>')
+            sheet_xml += '<pane ySplit="' + str(sheet['freeze_rows']) + '" xSplit="' + str(sheet['freeze_columns']) + '" topLeftCell="' + self.xlsCell(sheet['freeze_rows'], sheet[
+                'freeze_columns']) + '" activePane="bottomRight" state="frozen"/>'
+            sheet_xml += '<selection activeCell="' + self.xlsCell(sheet['freeze_rows'], 0) + '" activeCellId="0" pane="topRight" sqref="' + self.xlsCell(sheet['freeze_rows'], 0) + '"/>'
+            sheet_xml += '<selection activeCell="' + self.xlsCell(0, sheet['freeze_columns']) + '" activeCellId="0" pane="bottomLeft" sqref="' + self.xlsCell(0, sheet[
+                'freeze_columns']) + '"/>'
+            sheet_xml += '<selection activeCell="' + self.xlsCell(sheet['freeze_rows'], sheet['freeze_columns']) + '" activeCellId="0" pane="bottomRight" sqref="' + self.xlsCell(
+                sheet['freeze_rows'], sheet['freeze_columns']) + '"/>'
         elif sheet['freeze_rows']:
-            sheet['file_writer'].write(
-                '<pane ySplit="' + str(sheet['freeze_rows']) + '" topLeftCell="' + self.xlsCell(sheet['freeze_rows'], 0) + '" activePane="bottomLeft" state="frozen"/>')
-            sheet['file_writer'].write(
-                '<selection activeCell="' + self.xlsCell(sheet['freeze_rows'], 0) + '" activeCellId="0" pane="bottomLeft" sqref="' + self.xlsCell(sheet['freeze_rows'], 0) + '"/>')
+            sheet_xml += '<pane ySplit="' + str(sheet['freeze_rows']) + '" topLeftCell="' + self.xlsCell(sheet['freeze_rows'], 0) + '" activePane="bottomLeft" state="frozen"/>'
+            sheet_xml += '<selection activeCell="' + self.xlsCell(sheet['freeze_rows'], 0) + '" activeCellId="0" pane="bottomLeft" sqref="' + self.xlsCell(sheet['freeze_rows'], 0) + '"/>'
         elif sheet['freeze_columns']:
-            sheet['file_writer'].write(
-                '<pane xSplit="' + str(sheet['freeze_columns']) + '" topLeftCell="' + self.xlsCell(0, sheet['freeze_columns']) + '" activePane="topRight" state="frozen"/>')
-            sheet['file_writer'].write('<selection activeCell="' + self.xlsCell(0, sheet['freeze_columns']) + '" activeCellId="0" pane="topRight" sqref="' + self.xlsCell(0, sheet[
-                'freeze_columns']) + '"/>')
+            sheet_xml += '<pane xSplit="' + str(sheet['freeze_columns']) + '" topLeftCell="' + self.xlsCell(0, sheet['freeze_columns']) + '" activePane="topRight" state="frozen"/>'
+            sheet_xml += '<selection activeCell="' + self.xlsCell(0, sheet['freeze_columns']) + '" activeCellId="0" pane="topRight" sqref="' + self.xlsCell(0, sheet[
+                'freeze_columns']) + '"/>'
         else:
-            sheet['file_writer'].write('<selection activeCell="A1" activeCellId="0" pane="topLeft" sqref="A1"/>')
+            sheet_xml += '<selection activeCell="A1" activeCellId="0" pane="topLeft" sqref="A1"/>'
+
+        sheet_xml += '</sheetView>'
+        sheet_xml += '</sheetViews>'
+        sheet_xml += '<cols>'
 
-        sheet['file_writer'].write('</sheetView>')
-        sheet['file_writer'].write('</sheetViews>')
-        sheet['file_writer'].write('<cols>')
+        col_widths = list(sheet['col_widths'])
+        if sheet['auto_widths'] is not None:
+            min_width, max_width = self._auto_fit
+            col_widths += [min(max(width + 2, min_width), max_width) for width in sheet['auto_widths'][len(col_widths):]]
 
         i = 0
-        if len(col_widths) > 0:
-            for column_width in col_widths:
-                sheet['file_writer'].write(
-                    '<col collapsed="false" hidden="false" max="' + str(i + 1) + '" min="' + str(i + 1) + '" style="0" customWidth="true" width="' + str(column_width) + '"/>')
-                i += 1
+        for column_width in col_widths:
+            sheet_xml += '<col collapsed="false" hidden="false" max="' + str(i + 1) + '" min="' + str(i + 1) + '" style="0" customWidth="true" width="' + str(column_width) + '"/>'
+            i += 1
 
-        sheet['file_writer'].write('<col collapsed="false" hidden="false" max="1024" min="' + str(i + 1) + '" style="0" customWidth="false" width="11.5"/>')
-        sheet['file_writer'].write('</cols>')
-        sheet['file_writer'].write('<sheetData>')
+        sheet_xml += '<col collapsed="false" hidden="false" max="1024" min="' + str(i + 1) + '" style="0" customWidth="false" width="11.5"/>'
+        sheet_xml += '</cols>'
+        sheet_xml += '<sheetData>'
+
+        return sheet_xml
+
+    def _rolloverSheet(self, sheet):
+        if self._rollover is None:
+            raise Exception("Error: " + "sheet '" + str(sheet['sheetname']) + "' is full, the limit is " + str(self.EXCEL_2007_MAX_ROW) + " rows.")
+
+        base_name = sheet.get('base_name', sheet['sheetname'])
+        sheet_number = sheet.get('sheet_number', 1)
+        sheet_name = None
+        while sheet_name is None or sheet_name in self._sheets:
+            sheet_number += 1
+            suffix = ' (' + str(sheet_number) + ')'
+            sheet_name = str(base_name)[:self.SHEET_NAME_LENGTH - len(suffix)] + suffix
+
+        self.sheetClose(sheet['sheetname'])
+        self.sheetAdd(sheet_name, sheet['col_widths'], sheet['freeze_rows'], sheet['freeze_columns'])
+        self._continued_sheets[base_name] = sheet_name
+
+        continued = self._sheets[sheet_name]
+        continued['base_name'] = base_name
+        continued['sheet_number'] = sheet_number
+        continued['columns'] = sheet['columns']
+        continued['header_rows'] = sheet['header_rows']
+        if continued['auto_widths'] is not None:
+            continued['auto_widths'].extend(sheet['auto_widths'])
+        if sheet['header_rows']:
+            # header rows keep their row numbers, a block from writeSheetColumns or a gap left by writeCell isn't one entry per row
+            continued['file_writer'].write(''.join(sheet['header_rows']))
+            continued['row_count'] = continued['max_row'] = self._rollover
+            continued['max_column'] = sheet['max_column']
+
+        return continued
+
+    def _streamSheetCheck(self, sheet_name):
+        if sheet_name in self._sheets:
+            if self._sheets[sheet_name]['finalized'] or not self._sheets[sheet_name]['file_writer'].fd.isPending():
+                raise Exception("Error: " + "sheet '" + str(sheet_name) + "' was already written to the stream.")
+            return
+
+        for name in self._sheets:
+            self._finalizeSheet(name)
 
     def __addCellStyle(self, number_format, cell_style_string):
         cell_style_string = cell_style_string if cell_style_string else ""
-        number_format_idx = self.add_to_list_get_index(self._number_formats, number_format)
+        number_format_idx = self.add_to_list_get_index(self._number_formats, number_format, self._number_formats_index)
         lookup_string = str(number_format_idx) + ";" + cell_style_string
-        cell_style_idx = self.add_to_list_get_index(self._cell_styles, lookup_string)
+        cell_style_idx = self.add_to_list_get_index(self._cell_styles, lookup_string, self._cell_styles_index)
+        if cell_style_idx == len(self._style_indexes):
+            self._cell_style_types.append(self.__determineNumberFormatType(number_format))
+            self._style_indexes.append(self._compileCellStyle(number_format_idx, cell_style_string))
 
         return cell_style_idx
 
+    def addStyle(self, style):
+        style = dict(style)
+        number_format = self.__numberFormatStandardized(style.pop('format', 'GENERAL'))
+
+        return self.__addCellStyle(number_format, cell_style_string=json.dumps(style))
+
+    def _resolveStyles(self, styles):
+        if styles is None or styles == '':
+            return (0, 'n_auto')
+        if isinstance(styles, int):
+            return (styles, self._cell_style_types[styles])
+        if isinstance(styles, (list, tuple)):
+            return [self._resolveStyles(v) for v in styles]
+
+        return self._styles.get(styles, (0, 'n_auto'))
+
     def __initializeColumnTypes(self, header_types):
         column_types = []
         for v in header_types:
@@ -281,6 +1686,8 @@ class Writer:
     def writeSheetHeader(self, header_types, col_options={}):
         if not self._current_sheet or len(header_types) == 0:
             return 0
+        if len(header_types) > self.EXCEL_2007_MAX_COL:
+            raise Exception("Error: " + "header has " + str(len(header_types)) + " columns, the limit is " + str(self.EXCEL_2007_MAX_COL) + ".")
 
         sheet_name = self._current_sheet
 
@@ -302,45 +1709,318 @@ class Writer:
         sheet['columns'] = self.__initializeColumnTypes(header_types)
 
         if not suppress_row:
-            sheet['file_writer'].write('<row collapsed="false" customFormat="false" customHeight="false" hidden="false" ht="12.1" outlineLevel="0" r="1">')
+            header_row = io.StringIO()
+            header_row.write('<row collapsed="false" customFormat="false" customHeight="false" hidden="false" ht="12.1" outlineLevel="0" r="1">')
             for c, v in enumerate(header_types):
                 cell_style_idx = sheet['columns'][c]['default_cell_style'] if style is None else self.__addCellStyle('GENERAL', json.dumps(style[c] if '0' in style else style))
-                self._writeCell(sheet['file_writer'], 0, c, v, 'n_string', cell_style_idx)
-            sheet['file_writer'].write('</row>')
+                self._writeCell(header_row, 0, c, v, 'n_string', cell_style_idx)
+            header_row.write('</row>')
+            sheet['file_writer'].write(header_row.getvalue())
+            if self._rollover:
+                sheet['header_rows'].append(header_row.getvalue())
             sheet['row_count'] += 1
+            sheet['max_row'] = 1
+            sheet['max_column'] = len(header_types)
+
+    def _newEncoder(self, sheet, cell_styles=(), default_style=(0, 'n_auto')):
+        if self._stats is None:
+            return RowEncoder(cell_styles, default_style, self._shared_strings, self._escape, None, self._row_spans, sheet['auto_widths'])
+
+        return RowEncoder(cell_styles, default_style, self._shared_strings, self._stats.timed('escape', self._escape, sheet['sheetname']),
+                          self._stats.timed('date_conversion', self.convert_date_time, sheet['sheetname']), self._row_spans, sheet['auto_widths'])
+
+    def _rowEncoder(self, sheet, styles=None):
+        key = tuple(styles) if isinstance(styles, list) else styles
+        encoder = sheet['encoders'].get(key)
+        if encoder is None:
+            row_styles = self._resolveStyles(styles)
+            if isinstance(row_styles, list):
+                encoder = self._newEncoder(sheet, row_styles)
+            else:
+                encoder = self._newEncoder(sheet, default_style=row_styles)
+            if len(sheet['encoders']) >= self.MAX_ENCODERS:
+                sheet['encoders'].clear()
+            sheet['encoders'][key] = encoder
+
+        return encoder
 
     def writeSheetRow(self, row, styles=None, row_options=None):
         if self._current_sheet == "":
             return 0
 
+        stats = self._stats
+        if stats is not None:
+            start = time.perf_counter()
+            stats.cells.update(map(type, row))
+
+        sheet = self._sheets[self._current_sheet]
+        if sheet['cells']:
+            self._flushCells(sheet)
+        if sheet['row_count'] >= self.EXCEL_2007_MAX_ROW:
+            sheet = self._rolloverSheet(sheet)
+
+        encoder = self._rowEncoder(sheet, styles)
+        row_xml = encoder.encodeRow(sheet['row_count'], row, RowEncoder.rowTag(row_options))
+        sheet['file_writer'].write(row_xml)
+        if self._rollover and sheet['row_count'] < self._rollover:
+            sheet['header_rows'].append(row_xml)
+        sheet['row_count'] += 1
+        if len(row) > 0:
+            sheet['max_row'] = sheet['row_count']
+            if len(row) > sheet['max_column']:
+                sheet['max_column'] = len(row)
+
+        if stats is not None:
+            stats.add('serialize', time.perf_counter() - start)
+
+    def writeSheetRows(self, rows, styles=None, row_options=None, column_types=None):
+        if self._current_sheet == "":
+            return 0
+
+        stats = self._stats
+        if stats is not None:
+            start = time.perf_counter()
+            rows = stats.countRows(rows)
+
         sheet = self._sheets[self._current_sheet]
+        if sheet['cells']:
+            self._flushCells(sheet)
 
-        if row_options is not None:
-            ht = float(row_options['height']) if 'height' in row_options else 12.1
-            customHt = 'true' if 'height' in row_options else 'false'
-            hidden = 'true' if row_options.get('hidden', False) else 'false'
-            collapsed = int(row_options.get('collapsed', 0))
-            sheet['file_writer'].write(
-                '<row collapsed="' + ('true' if collapsed > 0 else 'false') + '" customFormat="0" customHeight="' + customHt + '" hidden="' + hidden + '" ht="' + str(
-                    ht) + '" outlineLevel="' + str(collapsed) + '" r="' + str(sheet['row_count'] + 1) + '">')
+        cell_styles = None
+        if column_types:
+            cell_styles = [(v['default_cell_style'], v['number_format_type']) for v in self.__initializeColumnTypes(column_types)]
+            encoder = self._newEncoder(sheet, cell_styles)
         else:
-            sheet['file_writer'].write(
-                '<row collapsed="false" customFormat="0" customHeight="false" hidden="false" ht="12.1" outlineLevel="0" r="' + str(sheet['row_count'] + 1) + '">')
+            encoder = self._rowEncoder(sheet, styles)
+
+        row_tag = RowEncoder.rowTag(row_options)
+        header_rows = self._rollover or 0
+        rows = iter(rows)
+
+        while True:
+            encodeRow = encoder.encodeRow
+            write = sheet['file_writer'].write
+            row_number = first_row = sheet['row_count']
+
+            # chunks are bounded by encoded length, not row count, so wide rows don't raise the peak memory
+            chunk = []
+            chunk_length = 0
+            for row in islice(rows, self.EXCEL_2007_MAX_ROW - first_row):
+                row_xml = encodeRow(row_number, row, row_tag)
+                chunk.append(row_xml)
+                chunk_length += len(row_xml)
+                row_number += 1
+                if chunk_length >= self.ROWS_CHUNK_LENGTH:
+                    if row_number - len(chunk) < header_rows:
+                        sheet['header_rows'].extend(chunk[:header_rows - row_number + len(chunk)])
+                    write(''.join(chunk))
+                    sheet['row_count'] = row_number
+                    chunk = []
+                    chunk_length = 0
+
+            if row_number - len(chunk) < header_rows:
+                sheet['header_rows'].extend(chunk[:header_rows - row_number + len(chunk)])
+            write(''.join(chunk))
+            sheet['row_count'] = row_number
+            if row_number > first_row and len(encoder.columns) > 0:
+                sheet['max_row'] = row_number
+                sheet['max_column'] = max(sheet['max_column'], len(encoder.columns))
+
+            if row_number < self.EXCEL_2007_MAX_ROW:
+                break
+
+            row = next(rows, None)
+            if row is None:
+                break
+
+            rows = chain([row], rows)
+            sheet = self._rolloverSheet(sheet)
+            encoder = self._newEncoder(sheet, cell_styles) if cell_styles is not None else self._rowEncoder(sheet, styles)
+
+        if stats is not None:
+            stats.add('serialize', time.perf_counter() - start)
+
+    def writeSheetColumns(self, columns, styles=None, row_options=None, column_types=None):
+        if self._current_sheet == "" or len(columns) == 0:
+            return 0
 
-        cell_count = len(row)
-        cell_styles = [(0, 'n_auto')] * cell_count
-        if styles:
-            row_styles = self._styles.get(styles, (0, 'n_auto'))
-            if isinstance(row_styles, tuple):
-                cell_styles = [row_styles] * cell_count
-            elif isinstance(row_styles, list):
-                cell_styles = (row_styles + cell_styles)[:cell_count]
+        stats = self._stats
+        if stats is not None:
+            start = time.perf_counter()
+            stats.countColumns(columns)
 
-        for c, v in enumerate(row):
-            self._writeCell(sheet['file_writer'], sheet['row_count'], c, v, cell_styles[c][1], cell_styles[c][0])
+        sheet = self._sheets[self._current_sheet]
+        if sheet['cells']:
+            self._flushCells(sheet)
 
-        sheet['file_writer'].write('</row>')
-        sheet['row_count'] += 1
+        row_count = len(columns[0])
+        for values in columns:
+            if len(values) != row_count:
+                raise Exception("Error: " + "all columns must have the same length.")
+
+        default_style = (0, 'n_auto')
+        if column_types:
+            cell_styles = [(v['default_cell_style'], v['number_format_type']) for v in self.__initializeColumnTypes(column_types)]
+        else:
+            row_styles = self._resolveStyles(styles)
+            if isinstance(row_styles, list):
+                cell_styles = row_styles
+            else:
+                cell_styles, default_style = [], row_styles
+        cell_styles = (list(cell_styles) + [default_style] * len(columns))[:len(columns)]
+
+        for c, values in enumerate(columns):
+            if numpy is not None and isinstance(values, numpy.ndarray) and values.dtype.kind == 'M' and cell_styles[c] == (0, 'n_auto'):
+                number_format = self.__numberFormatStandardized('datetime')
+                cell_styles[c] = (self.__addCellStyle(number_format, cell_style_string=json.dumps({})), self.__determineNumberFormatType(number_format))
+
+        encoder = self._newEncoder(sheet, cell_styles)
+        row_tag = RowEncoder.rowTag(row_options)
+        header_rows = self._rollover or 0
+
+        offset = 0
+        while offset < row_count:
+            if sheet['row_count'] >= self.EXCEL_2007_MAX_ROW:
+                sheet = self._rolloverSheet(sheet)
+                encoder = self._newEncoder(sheet, cell_styles)
+
+            size = min(self.COLUMNS_BLOCK_SIZE, max(self.COLUMNS_BLOCK_CELLS // len(columns), 1), row_count - offset, self.EXCEL_2007_MAX_ROW - sheet['row_count'])
+            if sheet['row_count'] < header_rows:
+                size = min(size, header_rows - sheet['row_count'])
+
+            block = [values[offset:offset + size] for values in columns]
+            rows_xml = encoder.encodeColumns(sheet['row_count'], block, row_tag)
+            if sheet['row_count'] < header_rows:
+                sheet['header_rows'].append(rows_xml)
+            sheet['file_writer'].write(rows_xml)
+            sheet['row_count'] += size
+            sheet['max_row'] = sheet['row_count']
+            sheet['max_column'] = max(sheet['max_column'], len(columns))
+            offset += size
+
+        if stats is not None:
+            stats.add('serialize', time.perf_counter() - start)
+
+    def writeCell(self, row_number, column_number, value, style=None):
+        if self._current_sheet == "":
+            return 0
+
+        sheet = self._sheets[self._current_sheet]
+        if row_number < sheet['row_count']:
+            raise Exception("Error: " + "row " + str(row_number + 1) + " was already written.")
+        if row_number >= self.EXCEL_2007_MAX_ROW or not 0 <= column_number < self.EXCEL_2007_MAX_COL:
+            raise Exception("Error: " + "cell is outside of the sheet.")
+
+        # rows further than the window behind the newest row are written out and can't be changed anymore
+        if row_number >= sheet['row_count'] + self._cell_window:
+            self._flushCells(sheet, row_number - self._cell_window + 1)
+
+        if style is None:
+            cell_style = (0, 'n_auto')
+        else:
+            cell_style = self._resolveStyles(style)
+            if isinstance(cell_style, list):
+                cell_style = cell_style[column_number] if column_number < len(cell_style) else (0, 'n_auto')
+
+        sheet['cells'].setdefault(row_number, {})[column_number] = (value, cell_style)
+
+    def _flushCells(self, sheet, end_row=None):
+        stats = self._stats
+        if stats is not None:
+            start = time.perf_counter()
+
+        cells = sheet['cells']
+        end_row = max(cells) + 1 if end_row is None else end_row
+        row_numbers = range(sheet['row_count'], end_row) if end_row - sheet['row_count'] <= len(cells) else sorted(r for r in cells if r < end_row)
+        write = sheet['file_writer'].write
+        encodeCells = self._rowEncoder(sheet).encodeCells
+        header_rows = self._rollover or 0
+
+        for row_number in row_numbers:
+            row = cells.pop(row_number, None)
+            if row is None:
+                continue
+
+            row_xml = encodeCells(row_number, sorted(row.items()))
+            write(row_xml)
+            if row_number < header_rows:
+                sheet['header_rows'].append(row_xml)
+
+            sheet['max_row'] = row_number + 1
+            sheet['max_column'] = max(sheet['max_column'], max(row) + 1)
+            if stats is not None:
+                stats.cells.update(type(value) for value, _ in row.values())
+
+        sheet['row_count'] = max(sheet['row_count'], end_row)
+
+        if stats is not None:
+            stats.add('serialize', time.perf_counter() - start)
+
+    def writeDataFrame(self, df, header=True, index=False, styles=None, header_styles=None, row_options=None):
+        names = [str(name) for name in df.columns]
+        columns = [dataframe_values(df.iloc[:, c]) for c in range(len(names))]
+        if index:
+            names.insert(0, str(df.index.name) if df.index.name is not None else '')
+            columns.insert(0, dataframe_values(df.index))
+
+        if header:
+            self.writeSheetRow(names, styles=header_styles)
+
+        self.writeSheetColumns(columns, styles=styles, row_options=row_options)
+
+    def writeSheetFromCursor(self, cursor, batch_size=CURSOR_BATCH_SIZE, header=True, header_styles=None, row_options=None):
+        if self._current_sheet == "":
+            return 0
+        if cursor.description is None:
+            raise Exception("Error: " + "cursor has no result set.")
+
+        batch = cursor.fetchmany(batch_size)
+        styles = self._cursorStyles(cursor.description, batch, [None] * len(cursor.description))
+        if header:
+            self.writeSheetRow([column[0] for column in cursor.description], styles=header_styles)
+
+        # the cursor is fetched on the calling thread (DB-API connections are often thread-bound), rows are encoded on a worker
+        with ThreadPoolExecutor(1) as executor:
+            pending = None
+            while batch:
+                if pending is not None:
+                    pending.result()
+                pending = executor.submit(self.writeSheetRows, batch, [0 if style is None else style for style in styles], row_options)
+                batch = cursor.fetchmany(batch_size)
+                if None in styles:
+                    styles = self._cursorStyles(cursor.description, batch, styles)
+
+            if pending is not None:
+                pending.result()
+
+    def _cursorStyles(self, description, rows, styles):
+        # a column is typed by the driver's Python type_code or by its first non-NULL value, all-NULL columns wait for a later batch
+        styles = list(styles)
+        for c, column in enumerate(description):
+            if styles[c] is not None:
+                continue
+
+            value = next((row[c] for row in rows if row[c] is not None), None)
+            kind = column[1] if isinstance(column[1], type) else type(value)
+            if issubclass(kind, datetime.datetime):
+                styles[c] = self.addStyle({'format': 'datetime'})
+            elif issubclass(kind, datetime.date):
+                styles[c] = self.addStyle({'format': 'date'})
+            elif issubclass(kind, datetime.time):
+                styles[c] = self.addStyle({'format': 'HH:MM:SS'})
+            elif issubclass(kind, decimal.Decimal):
+                if len(column) > 5 and isinstance(column[5], int):
+                    scale = column[5]
+                elif value is not None:
+                    scale = max((-row[c].as_tuple().exponent for row in rows if isinstance(row[c], decimal.Decimal) and row[c].is_finite()), default=0)
+                else:
+                    continue
+                scale = min(max(scale, 0), 15)
+                styles[c] = self.addStyle({'format': '0.' + '0' * scale if scale > 0 else 'integer'})
+            elif value is not None or isinstance(column[1], type):
+                styles[c] = 0
+
+        return styles
 
     def countSheetRows(self, sheet_name=''):
         sheet_name = sheet_name if sheet_name else self._current_sheet
@@ -351,169 +2031,169 @@ class Writer:
         if not sheet_name or self._sheets[sheet_name]['finalized']:
             return 0
 
+        stats = self._stats
+        if stats is not None:
+            start = time.perf_counter()
+
         sheet = self._sheets[sheet_name]
-        sheet['file_writer'].write('</sheetData>')
-        if len(sheet['merge_cells']) > 0:
-            sheet['file_writer'].write('<mergeCells count="' + str(len(sheet['merge_cells'])) + '">')
-            for _range in sheet['merge_cells']:
-                sheet['file_writer'].write('<mergeCell ref="' + _range + '"/>')
+        if sheet['cells']:
+            self._flushCells(sheet)
+        if self._appendable:
+            sheet['file_writer'].purge()
+            sheet['body_mark'] = sheet['storage'].mark()
+        sheet['file_writer'].write(self._buildSheetEpilogue(sheet))
+        sheet['file_writer'].close()
+
+        sheet['finalized'] = True
 
-            sheet['file_writer'].write('</mergeCells>')
+        if stats is not None:
+            sheet_stats = stats.sheet(sheet_name)
+            sheet_stats['rows'] = sheet['row_count']
+            sheet_stats['flush_count'] = sheet['file_writer'].flush_count
+            stats.finishSheet(sheet_name)
+            stats.add('finalize_sheet', time.perf_counter() - start)
 
-        max_cell = self.xlsCell(sheet['row_count'] - 1, len(sheet['columns']) - 1)
+    def _buildSheetEpilogue(self, sheet):
+        sheet_xml = '</sheetData>'
+        if len(sheet['merge_cells']) > 0:
+            xlsCell = self.xlsCell
+            sheet_xml += '<mergeCells count="' + str(len(sheet['merge_cells'])) + '">'
+            sheet_xml += ''.join('<mergeCell ref="' + xlsCell(row1, col1) + ':' + xlsCell(row2, col2) + '"/>' for row1, col1, row2, col2 in sheet['merge_cells'])
+            sheet_xml += '</mergeCells>'
 
         if sheet['auto_filter']:
-            sheet['file_writer'].write('<autoFilter ref="' + sheet['auto_filter'] + '"></autoFilter>')
-
-        sheet['file_writer'].write('<printOptions headings="false" gridLines="false" gridLinesSet="true" horizontalCentered="false" verticalCentered="false"/>')
-        sheet['file_writer'].write('<pageMargins left="0.5" right="0.5" top="1.0" bottom="1.0" header="0.5" footer="0.5"/>')
-        sheet['file_writer'].write(
-            '<pageSetup blackAndWhite="false" cellComments="none" copies="1" draft="false" firstPageNumber="1" fitToHeight="1" fitToWidth="1" horizontalDpi="300" orientation="portrait" pageOrder="downThenOver" paperSize="1" scale="100" useFirstPageNumber="true" usePrinterDefaults="false" verticalDpi="300"/>')
-        sheet['file_writer'].write('<headerFooter differentFirst="false" differentOddEven="false">')
-        sheet['file_writer'].write('<oddHeader>&amp;C&amp;&quot;Times New Roman,Regular&quot;&amp;12&amp;A</oddHeader>')
-        sheet['file_writer'].write('<oddFooter>&amp;C&amp;&quot;Times New Roman,Regular&quot;&amp;12Page &amp;P</oddFooter>')
-        sheet['file_writer'].write('</headerFooter>')
-        sheet['file_writer'].write('</worksheet>')
-
-        # max_cell_tag = '<dimension ref="A1:' + str(max_cell) + '"/>'
-        # padding_length = sheet['max_cell_tag_end'] - sheet['max_cell_tag_start'] - len(max_cell_tag)
-        #
-        # sheet['file_writer'].fseek(sheet['max_cell_tag_start'])
-        # sheet['file_writer'].write(max_cell_tag * padding_length)
+            sheet_xml += '<autoFilter ref="' + sheet['auto_filter'] + '"></autoFilter>'
 
-        sheet['file_writer'].close()
+        sheet_xml += '<printOptions headings="false" gridLines="false" gridLinesSet="true" horizontalCentered="false" verticalCentered="false"/>'
+        sheet_xml += '<pageMargins left="0.5" right="0.5" top="1.0" bottom="1.0" header="0.5" footer="0.5"/>'
+        sheet_xml += '<pageSetup blackAndWhite="false" cellComments="none" copies="1" draft="false" firstPageNumber="1" fitToHeight="1" fitToWidth="1" horizontalDpi="300" orientation="portrait" pageOrder="downThenOver" paperSize="1" scale="100" useFirstPageNumber="true" usePrinterDefaults="false" verticalDpi="300"/>'
+        sheet_xml += '<headerFooter differentFirst="false" differentOddEven="false">'
+        sheet_xml += '<oddHeader>&amp;C&amp;&quot;Times New Roman,Regular&quot;&amp;12&amp;A</oddHeader>'
+        sheet_xml += '<oddFooter>&amp;C&amp;&quot;Times New Roman,Regular&quot;&amp;12Page &amp;P</oddFooter>'
+        sheet_xml += '</headerFooter>'
+        sheet_xml += '</worksheet>'
 
-        sheet['finalized'] = True
+        return sheet_xml
 
     def markMergedCell(self, sheet_name, cell1, cell2):
         if not sheet_name or self._sheets[sheet_name]['finalized']:
             return 0
 
-        sheet = self._sheets[sheet_name]
-        startCell = self.xlsCell(cell1[0], cell1[1])
-        endCell = self.xlsCell(cell2[0], cell2[1])
-        sheet['merge_cells'].append(str(startCell) + ":" + str(endCell))
+        row1, row2 = sorted((cell1[0], cell2[0]))
+        col1, col2 = sorted((cell1[1], cell2[1]))
+        if row1 < 0 or col1 < 0 or row2 >= self.EXCEL_2007_MAX_ROW or col2 >= self.EXCEL_2007_MAX_COL:
+            raise Exception("Error: " + "merged range is outside of the sheet.")
 
-    def writeSheet(self, data, sheet_name='', header_types=[]):
+        self._sheets[sheet_name]['merge_cells'].add(row1, col1, row2, col2)
+
+    def writeSheet(self, data, sheet_name='', header_types=[], header=None):
         sheet_name = sheet_name if sheet_name else 'Sheet1'
         data = data if data else [['']]
+        self._current_sheet = sheet_name
         if header_types:
-            self.writeSheetHeader(sheet_name, header_types)
+            self.writeSheetHeader(header_types, {'suppress_row': True})
+        else:
+            self.sheetAdd(sheet_name)
 
-        for row in data:
-            self.writeSheetRow(sheet_name, row)
+        if header:
+            self.writeSheetRow(header)
+        self.writeSheetRows(data, column_types=header_types)
 
         self._finalizeSheet(sheet_name)
 
     def _writeCell(self, file, row_number, column_number, value, num_format_type, cell_style_idx):
-        cell_name = self.xlsCell(row_number, column_number)
-
-        if value == '' or value is None:
-            file.write('<c r="' + cell_name + '" s="' + str(cell_style_idx) + '"/>')
-        elif num_format_type == 'n_auto':
-            if type(value) in (int, float):
-                file.write('<c r="' + cell_name + '" s="' + str(cell_style_idx) + '" t="n"><v>' + self.xmlspecialchars(value) + '</v></c>')
-            else:
-                file.write('<c r="' + cell_name + '" s="' + str(cell_style_idx) + '" t="inlineStr"><is><t>' + self.xmlspecialchars(value) + '</t></is></c>')
-        elif type(value) == str and value[:1] == '=':
-            file.write('<c r="' + cell_name + '" s="' + str(cell_style_idx) + '" t="s"><f>' + self.xmlspecialchars(value) + '</f></c>')
-        elif num_format_type == 'n_date':
-            file.write('<c r="' + cell_name + '" s="' + str(cell_style_idx) + '" t="n"><v>' + str(self.convert_date_time(value)) + '</v></c>')
-        elif num_format_type == 'n_datetime':
-            file.write('<c r="' + cell_name + '" s="' + str(cell_style_idx) + '" t="n"><v>' + str(self.convert_date_time(value)) + '</v></c>')
-        elif num_format_type == 'n_numeric':
-            file.write('<c r="' + cell_name + '" s="' + str(cell_style_idx) + '" t="n"><v>' + self.xmlspecialchars(value) + '</v></c>')
-        elif num_format_type == 'n_string':
-            file.write('<c r="' + cell_name + '" s="' + str(cell_style_idx) + '" t="inlineStr"><is><t>' + self.xmlspecialchars(value) + '</t></is></c>')
-
-    def _styleFontIndexes(self):
-        border_allowed = ['left', 'right', 'top', 'bottom']
-        border_style_allowed = ['thin', 'medium', 'thick', 'dashDot', 'dashDotDot', 'dashed', 'dotted', 'double', 'hair', 'mediumDashDot', 'mediumDashDotDot', 'mediumDashed',
-                                'slantDashDot']
-        horizontal_allowed = ['general', 'left', 'right', 'justify', 'center']
-        vertical_allowed = ['bottom', 'center', 'distributed', 'top']
-        default_font = {'size': '10', 'name': 'Arial', 'family': '2'}
-        fills = ['', '']
-        fonts = ['', '', '', '']
-        borders = ['']
-        style_indexes = [None] * len(self._cell_styles)
-
-        for i, cell_style_string in enumerate(self._cell_styles):
-            semi_colon_pos = cell_style_string.find(";")
-            number_format_idx = int(cell_style_string[0:semi_colon_pos])
-            style_json_string = cell_style_string[semi_colon_pos + 1:]
-            style = json.loads(style_json_string) if style_json_string else {}
-            style_indexes[i] = {'num_fmt_idx': number_format_idx}
-
-            if 'border' in style and isinstance(style.get('border', 0), str):
-                border_value = {}
-                border_value['side'] = list(reduce(set.intersection, map(set, [style['border'].split(","), border_allowed])))
-                if 'border-color' in style:
-                    if style['border-style'] in border_style_allowed:
-                        border_value['style'] = style['border-style']
-                    if isinstance(style['border-color'], str):
-                        if style['border-color'][:1] == '#':
-                            v = style['border-color'][1:7]
-                            v = v[0] + v[0] + v[1] + v[1] + v[2] + v[2] if len(v) == 3 else v
-                            border_value['color'] = "FF" + v.upper()
-
-                style_indexes[i]['border_idx'] = self.add_to_list_get_index(borders, json.dumps(border_value))
-
-            if 'fill' in style:
-                if isinstance(style.get('fill', 0), str):
-                    if style['fill'][:1] == '#':
-                        v = style['fill'][1:7]
+        file.write(RowEncoder.encodeCell('<c r="' + self.xlsCell(row_number, column_number), '" s="' + str(cell_style_idx) + '"', value, num_format_type,
+                                         self._shared_strings, self._escape))
+
+    BORDER_ALLOWED = ['left', 'right', 'top', 'bottom']
+    BORDER_STYLE_ALLOWED = ['thin', 'medium', 'thick', 'dashDot', 'dashDotDot', 'dashed', 'dotted', 'double', 'hair', 'mediumDashDot', 'mediumDashDotDot', 'mediumDashed',
+                            'slantDashDot']
+    HORIZONTAL_ALLOWED = ['general', 'left', 'right', 'justify', 'center']
+    VERTICAL_ALLOWED = ['bottom', 'center', 'distributed', 'top']
+    DEFAULT_FONT = {'size': '10', 'name': 'Arial', 'family': '2'}
+
+    def _compileCellStyle(self, number_format_idx, style_json_string):
+        border_allowed = self.BORDER_ALLOWED
+        border_style_allowed = self.BORDER_STYLE_ALLOWED
+        horizontal_allowed = self.HORIZONTAL_ALLOWED
+        vertical_allowed = self.VERTICAL_ALLOWED
+        default_font = self.DEFAULT_FONT
+
+        style = json.loads(style_json_string) if style_json_string else {}
+        style_index = {'num_fmt_idx': number_format_idx}
+
+        if 'border' in style and isinstance(style.get('border', 0), str):
+            border_value = {}
+            border_value['side'] = list(reduce(set.intersection, map(set, [style['border'].split(","), border_allowed])))
+            if 'border-color' in style:
+                if style['border-style'] in border_style_allowed:
+                    border_value['style'] = style['border-style']
+                if isinstance(style['border-color'], str):
+                    if style['border-color'][:1] == '#':
+                        v = style['border-color'][1:7]
                         v = v[0] + v[0] + v[1] + v[1] + v[2] + v[2] if len(v) == 3 else v
-                        style_indexes[i]['fill_idx'] = self.add_to_list_get_index(fills, "FF" + v.upper())
-
-            if 'halign' in style:
-                if style['halign'] in horizontal_allowed:
-                    style_indexes[i]['alignment'] = True
-                    style_indexes[i]['halign'] = style['halign']
-
-            if 'valign' in style:
-                if style['valign'] in vertical_allowed:
-                    style_indexes[i]['alignment'] = True
-                    style_indexes[i]['valign'] = style['valign']
-
-            if 'wrap_text' in style:
-                style_indexes[i]['alignment'] = True
-                style_indexes[i]['wrap_text'] = bool(style['wrap_text'])
-
-            font = default_font.copy()
-            is_add_font_idx = False
-            if 'font-size' in style:
-                font['size'] = float(style['font-size'])
+                        border_value['color'] = "FF" + v.upper()
+
+            style_index['border_idx'] = self.add_to_list_get_index(self._borders, json.dumps(border_value), self._borders_index)
+
+        if 'fill' in style:
+            if isinstance(style.get('fill', 0), str):
+                if style['fill'][:1] == '#':
+                    v = style['fill'][1:7]
+                    v = v[0] + v[0] + v[1] + v[1] + v[2] + v[2] if len(v) == 3 else v
+                    style_index['fill_idx'] = self.add_to_list_get_index(self._fills, "FF" + v.upper(), self._fills_index)
+
+        if 'halign' in style:
+            if style['halign'] in horizontal_allowed:
+                style_index['alignment'] = True
+                style_index['halign'] = style['halign']
+
+        if 'valign' in style:
+            if style['valign'] in vertical_allowed:
+                style_index['alignment'] = True
+                style_index['valign'] = style['valign']
+
+        if 'wrap_text' in style:
+            style_index['alignment'] = True
+            style_index['wrap_text'] = bool(style['wrap_text'])
+
+        font = default_font.copy()
+        is_add_font_idx = False
+        if 'font-size' in style:
+            font['size'] = float(style['font-size'])
+            is_add_font_idx = True
+
+        if 'font' in style:
+            if isinstance(style.get('font', 0), str):
+                if style['font'] == 'Comic Sans MS': font['family'] = 4
+                if style['font'] == 'Times New Roman': font['family'] = 1
+                if style['font'] == 'Courier New': font['family'] = 3
+                font['name'] = str(style['font'])
                 is_add_font_idx = True
 
-            if 'font' in style:
-                if isinstance(style.get('font', 0), str):
-                    if style['font'] == 'Comic Sans MS': font['family'] = 4
-                    if style['font'] == 'Times New Roman': font['family'] = 1
-                    if style['font'] == 'Courier New': font['family'] = 3
-                    font['name'] = str(style['font'])
-                    is_add_font_idx = True
+        if 'font-style' in style:
+            if isinstance(style.get('font-style', 0), str):
+                if style['font-style'].find('bold') > -1: font['bold'] = True
+                if style['font-style'].find('italic') > -1: font['italic'] = True
+                if style['font-style'].find('strike') > -1: font['strike'] = True
+                if style['font-style'].find('underline') > -1: font['underline'] = True
+                is_add_font_idx = True
 
-            if 'font-style' in style:
-                if isinstance(style.get('font-style', 0), str):
-                    if style['font-style'].find('bold') > -1: font['bold'] = True
-                    if style['font-style'].find('italic') > -1: font['italic'] = True
-                    if style['font-style'].find('strike') > -1: font['strike'] = True
-                    if style['font-style'].find('underline') > -1: font['underline'] = True
+        if 'color' in style:
+            if isinstance(style.get('color', 0), str):
+                if style['color'][:1] == '#':
+                    v = style['color'][1:7]
+                    v = v[0] + v[0] + v[1] + v[1] + v[2] + v[2] if len(v) == 3 else v
+                    font['color'] = "FF" + v.upper()
                     is_add_font_idx = True
 
-            if 'color' in style:
-                if isinstance(style.get('color', 0), str):
-                    if style['color'][:1] == '#':
-                        v = style['color'][1:7]
-                        v = v[0] + v[0] + v[1] + v[1] + v[2] + v[2] if len(v) == 3 else v
-                        font['color'] = "FF" + v.upper()
-                        is_add_font_idx = True
+        if is_add_font_idx:
+            style_index['font_idx'] = self.add_to_list_get_index(self._fonts, json.dumps(font), self._fonts_index)
 
-            if is_add_font_idx:
-                style_indexes[i]['font_idx'] = self.add_to_list_get_index(fonts, json.dumps(font))
+        return style_index
 
-        return {'fills': fills, 'fonts': fonts, 'borders': borders, 'styles': style_indexes}
+    def _styleFontIndexes(self):
+        return {'fills': self._fills, 'fonts': self._fonts, 'borders': self._borders, 'styles': self._style_indexes}
 
     def _writeStylesXML(self):
         r = self._styleFontIndexes()
@@ -522,8 +2202,7 @@ class Writer:
         fonts = r['fonts']
         borders = r['borders']
         style_indexes = r['styles']
-        temporary_filename = self._tempFilename()
-        file = BuffererWriter(temporary_filename)
+        file = io.StringIO()
 
         file.write('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>' + "\n")
         file.write('<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">')
@@ -637,9 +2316,8 @@ class Writer:
         file.write('<cellStyle builtinId="5" customBuiltin="false" name="Percent" xfId="19"/>')
         file.write('</cellStyles>')
         file.write('</styleSheet>')
-        file.close()
 
-        return temporary_filename
+        return file.getvalue()
 
     def _buildAppXML(self):
         app_xml = ""
@@ -722,6 +2400,9 @@ class Writer:
             self._sheets[sheet]['xmlname']) + '"/>'
             i += 1
 
+        if self._shared_strings is not None:
+            wkbkrels_xml += '<Relationship Id="rId' + str(i + 2) + '" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" Target="sharedStrings.xml"/>'
+
         wkbkrels_xml += "\n"
         wkbkrels_xml += '</Relationships>'
 
@@ -740,6 +2421,12 @@ class Writer:
 
         content_types_xml += '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
         content_types_xml += '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+
+        if self._shared_strings is not None:
+            content_types_xml += '<Override PartName="/xl/sharedStrings.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+        if self._appendable:
+            content_types_xml += '<Override PartName="/' + APPEND_STATE_PART + '" ContentType="application/json"/>'
+
         content_types_xml += '<Override PartName="/docProps/app.xml" ContentType="application/vnd.openxmlformats-officedocument.extended-properties+xml"/>'
         content_types_xml += '<Override PartName="/docProps/core.xml" ContentType="application/vnd.openxmlformats-package.core-properties+xml"/>'
         content_types_xml += "\n"
@@ -790,12 +2477,10 @@ class Writer:
         if type(val) != str:
             return str(val)
 
-        badchars = "\x00\x01\x02\x03\x04\x05\x06\x07\x08\x0b\x0c\x0e\x0f\x10\x11\x12\x13\x14\x15\x16\x17\x18\x19\x1a\x1b\x1c\x1d\x1e\x1f\x7f"
-        goodchars = "                              "
-
-        return html_special_chars(val.translate(str.maketrans(badchars, goodchars)))
+        return xml_escape(val)
 
     @staticmethod
+    @lru_cache(maxsize=1024)
     def __determineNumberFormatType(num_format):
         num_format = re.sub(r"(Black|Blue|Cyan|Green|Magenta|Red|White|Yellow)", "", num_format, flags=re.I)
 
@@ -853,8 +2538,13 @@ class Writer:
         return escaped
 
     @staticmethod
-    def add_to_list_get_index(haystack, needle):
-        if needle in haystack:
+    def add_to_list_get_index(haystack, needle, index=None):
+        if index is not None:
+            existing_idx = index.get(needle)
+            if existing_idx is None:
+                existing_idx = index[needle] = len(haystack)
+                haystack.append(needle)
+        elif needle in haystack:
             existing_idx = haystack.index(needle)
         else:
             existing_idx = len(haystack)
@@ -864,48 +2554,20 @@ class Writer:
 
     @staticmethod
     def convert_date_time(date_input):
-        days = seconds = 0
-        year = month = day = 0
-        hour = _min = sec = 0
-        date_time = date_input
+        if isinstance(date_input, str):
+            return convert_date_string(date_input)
 
-        matches = re.search(r'(\d{4})-(\d{2})-(\d{2})', date_time)
-        if matches:
-            (year, month, day) = map(int, matches.groups())
+        if isinstance(date_input, datetime.datetime):
+            seconds = (date_input.hour * 3600 + date_input.minute * 60 + date_input.second + date_input.microsecond / 1000000) / 86400
+            return excel_days(date_input) + seconds
 
-        matches = re.search(r'(\d{2}):(\d{2}):(\d{2})', date_time)
-        if matches:
-            (hour, _min, sec) = map(int, matches.groups())
-            seconds = (hour * 3600 + _min * 60 + sec) / 86400
+        if isinstance(date_input, datetime.date):
+            return excel_days(date_input)
 
-        ymd = "{}-{}-{}".format(year, month, day)
-        if ymd == '1899-12-31':  return seconds
-        if ymd == '1900-01-00':  return seconds
-        if ymd == '1900-02-29':  return seconds + 60
+        if isinstance(date_input, datetime.time):
+            return (date_input.hour * 3600 + date_input.minute * 60 + date_input.second + date_input.microsecond / 1000000) / 86400
 
-        epoch = 1900
-        offset = 0
-        norm = 300
-        _range = year - epoch
-
-        leap = 1 if ((year % 400 == 0) or ((year % 4 == 0) and (year % 100 != 0))) else 0
-        mdays = (31, (29 if leap == 1 else 28), 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
-
-        if year < epoch or year > 9999: return 0
-        if month < 1 or month > 12: return 0
-        if day < 1 or day > mdays[month - 1]: return 0
-
-        days = day
-        days += sum(mdays[0:month - 1])
-        days += _range * 365
-        days += int(_range / 4)
-        days -= int((_range + offset) / 100)
-        days += int((_range + offset + norm) / 400)
-        days -= leap
-
-        if days > 59: days += 1
-
-        return days + seconds
+        return convert_date_string(str(date_input))
 
     def setStyles(self, _styles):
         styles = copy.deepcopy(_styles)
@@ -923,4 +2585,41 @@ class Writer:
                 cell_style_idx = self.__addCellStyle(number_format, cell_style_string=json.dumps(styles[key]))
                 self._styles[key] = (cell_style_idx, self.__determineNumberFormatType(number_format))
 
-        self._styleFontIndexes()
+
+class WorkbookTemplate:
+    MAX_PARTS = 256
+
+    def __init__(self, writer=None, styles=None):
+        self.writer = writer if writer is not None else Writer()
+        if len(self.writer._sheets) > 0:
+            raise Exception("Error: " + "a template must be created before any worksheet is added.")
+        if styles:
+            self.writer.setStyles(styles)
+
+        self.style_count = len(self.writer._cell_styles)
+        self.styles_xml = self.writer._writeStylesXML()
+        self.parts = {}
+
+    def newWriter(self):
+        writer = copy.copy(self.writer)
+        for name, value in vars(self.writer).items():
+            if isinstance(value, (list, dict)):
+                setattr(writer, name, copy.copy(value))
+        writer._file_pool = FilePool(self.writer._file_pool.max_open)
+        writer._shared_strings = copy.deepcopy(self.writer._shared_strings)
+        writer._stats = copy.deepcopy(self.writer._stats)
+        writer._template = self
+
+        return writer
+
+    def deflatePart(self, text):
+        part = self.parts.get(text)
+        if part is None:
+            data = text.encode('utf-8')
+            compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS)
+            part = (zlib.crc32(data), len(data), compressor.compress(data) + compressor.flush())
+            if len(self.parts) >= self.MAX_PARTS:
+                self.parts.clear()
+            self.parts[text] = part
+
+        return part
@@ -1,4 +1,8 @@
 __version__ = '1.0.0'
 __VERSION__ = __version__
 
-from .XLSXWriter import Writer
+from .XLSXWriter import Writer, WorkbookTemplate, WriterStats, FileSheetStorage, SpooledSheetStorage, DeflatedSheetStorage
+from .AsyncWriter import AsyncWriter
+from .ThreadedWriter import ThreadedWriter
+from .BatchWriter import BatchWriter
+from .CsvConverter import CsvConverter
@@ -0,0 +1,40 @@
+import argparse
+import sys
+
+from .CsvConverter import CsvConverter
+
+
+def convert(args):
+    converter = CsvConverter(args.processes, args.sample_rows, args.delimiter, args.encoding, not args.no_header, args.tempdir)
+    result = converter.convert(args.inputs, args.output)
+
+    for sheet in result['sheets']:
+        print("{}: sheet '{}', {} rows, {:.1f} MiB in {:.2f} s. Columns: {}".format(
+            sheet['input'], sheet['sheet_name'], sheet['rows'], sheet['bytes'] / 1048576, sheet['seconds'], ', '.join(sheet['types'])), file=sys.stderr)
+
+    seconds = max(result['seconds'], 1e-9)
+    print("{}: {} rows, {:.1f} MiB in {:.2f} s. {:.0f} rows/s, {:.1f} MiB/s".format(
+        result['output'], result['rows'], result['bytes'] / 1048576, result['seconds'], result['rows'] / seconds, result['bytes'] / 1048576 / seconds), file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m XLSXWriter')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    parser_convert = commands.add_parser('convert', help='convert CSV files to one xlsx workbook, one sheet per file')
+    parser_convert.add_argument('inputs', nargs='+', help='CSV files')
+    parser_convert.add_argument('-o', '--output', required=True, help='xlsx file to write')
+    parser_convert.add_argument('-p', '--processes', type=int, default=None, help='worker processes, default: CPU count')
+    parser_convert.add_argument('-d', '--delimiter', default=',')
+    parser_convert.add_argument('-e', '--encoding', default='utf-8')
+    parser_convert.add_argument('--sample-rows', type=int, default=CsvConverter.SAMPLE_ROWS, help='rows used to infer column types')
+    parser_convert.add_argument('--no-header', action='store_true', help='the first row is data, not a header')
+    parser_convert.add_argument('--tempdir', default=None)
+    parser_convert.set_defaults(function=convert)
+
+    args = parser.parse_args(argv)
+    args.function(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+import os
+import sys
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import XLSXWriter
+
+
+def getTime():
+    return round(time.time() * 1000)
+
+
+def rows(start, count):
+    return ([i, 'report row ' + str(i), i * 1.25, '2020-01-01'] for i in range(start, start + count))
+
+
+def main():
+    testFilePath = "test.xlsx"
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    delta = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+
+    start = getTime()
+    writer = XLSXWriter.Writer()
+    writer.setAppendable()
+    writer.sheetAdd('Report')
+    writer.writeSheetRows(rows(0, row_count))
+    writer.saveAs(testFilePath)
+    print("rows: {}. full write: {} ms".format(row_count, getTime() - start))
+
+    start = getTime()
+    writer = XLSXWriter.Writer()
+    writer.openForAppend(testFilePath)
+    writer.writeSheetRows(rows(row_count, delta))
+    writer.saveAs(testFilePath)
+    print("rows: +{}. append: {} ms".format(delta, getTime() - start))
+
+    with zipfile.ZipFile(testFilePath) as zip:
+        if zip.testzip() is not None:
+            raise Exception("Error: " + "appended workbook is corrupt.")
+
+    os.remove(testFilePath)
+
+
+if __name__ == '__main__':
+    main()
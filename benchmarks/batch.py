@@ -0,0 +1,64 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import XLSXWriter
+
+STYLES = {
+    'header': {'font-style': 'bold', 'fill': '#b3d8ff', 'border': 'left,right,top,bottom', 'halign': 'center'},
+    'body': [{'format': 'integer'}, {'format': 'string'}, {'format': 'price'}, {'format': 'date'}],
+}
+
+
+def getTime():
+    return round(time.time() * 1000)
+
+
+def customer_rows(customer, row_count):
+    return ([i, 'customer ' + str(customer), i * 1.25, '2020-01-0' + str(1 + i % 9)] for i in range(row_count))
+
+
+def naive(jobs):
+    for job in jobs:
+        writer = XLSXWriter.Writer()
+        writer.setStyles(STYLES)
+        writer.sheetAdd('Sheet1')
+        writer.writeSheetRow(job['header'], styles='header')
+        writer.writeSheetRows(job['source'](*job['args']), styles='body')
+        writer.saveAs(job['output'])
+
+
+def main():
+    job_count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    row_count = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    processes = [int(p) for p in sys.argv[3].split(',')] if len(sys.argv) > 3 else [0, os.cpu_count() or 1]
+    directory = tempfile.mkdtemp(prefix='xlsx_batch_')
+
+    jobs = [{'output': os.path.join(directory, str(i) + '.xlsx'), 'source': customer_rows, 'args': (i, row_count), 'styles': STYLES,
+             'header': ['id', 'customer', 'amount', 'date'], 'header_styles': 'header', 'row_styles': 'body'} for i in range(job_count)]
+
+    start = getTime()
+    naive(jobs)
+    print("jobs: {}x{} rows. naive loop: {} ms".format(job_count, row_count, getTime() - start))
+
+    for process_count in processes:
+        start = getTime()
+        results = XLSXWriter.BatchWriter(processes=process_count).runAll(jobs)
+        end = getTime() - start
+
+        errors = [r for r in results if r['error']]
+        if errors:
+            raise Exception("Error: " + errors[0]['error'])
+
+        print("jobs: {}x{} rows. processes: {}. Time: {} ms. Per job: {:.2f} ms avg".format(
+            job_count, row_count, process_count or 'inline', end, sum(r['seconds'] for r in results) * 1000 / len(results)))
+
+    shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
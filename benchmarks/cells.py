@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import XLSXWriter
+
+
+def getTime():
+    return round(time.time() * 1000)
+
+
+def cell_value(row, block, c):
+    return row * 10 + c if c % 2 else 'block ' + str(block)
+
+
+def grid(row_count, blocks, group):
+    writer = XLSXWriter.Writer()
+    writer.sheetAdd('Layout')
+    rows = [[None] * (blocks * 2 + 1) for _ in range(row_count)]
+    for first in range(0, row_count, group):
+        for block in range(blocks):
+            for c in range(2):
+                for row in range(first, min(first + group, row_count)):
+                    rows[row][block * 2 + c] = cell_value(row, block, c)
+        rows[first][blocks * 2] = 'total ' + str(first)
+    writer.writeSheetRows(rows)
+    writer.saveAs("test.xlsx")
+
+
+def window(row_count, blocks, group):
+    writer = XLSXWriter.Writer()
+    writer.setCellWindow(group)
+    writer.sheetAdd('Layout')
+    for first in range(0, row_count, group):
+        for block in range(blocks):
+            for c in range(2):
+                for row in range(first, min(first + group, row_count)):
+                    writer.writeCell(row, block * 2 + c, cell_value(row, block, c))
+        writer.writeCell(first, blocks * 2, 'total ' + str(first))
+    writer.saveAs("test.xlsx")
+
+
+def main():
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    blocks = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    group = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+
+    for function in (grid, window):
+        start = getTime()
+        function(row_count, blocks, group)
+        end = getTime() - start
+
+        tracemalloc.start()
+        function(row_count // 10, blocks, group)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        print("rows: {}x{} blocks. {}: {} ms. Peak memory for {} rows: {:.1f} MiB".format(
+            row_count, blocks, function.__name__, end, row_count // 10, peak / 1048576))
+
+    os.remove("test.xlsx")
+
+
+if __name__ == '__main__':
+    main()
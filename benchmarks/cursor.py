@@ -0,0 +1,86 @@
+import datetime
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import XLSXWriter
+
+
+def getTime():
+    return round(time.time() * 1000)
+
+
+def create_database(filename, row_count):
+    db = sqlite3.connect(filename, detect_types=sqlite3.PARSE_DECLTYPES)
+    db.execute('CREATE TABLE orders (id INTEGER, customer TEXT, amount REAL, day DATE, note TEXT)')
+    db.executemany('INSERT INTO orders VALUES (?, ?, ?, ?, ?)',
+                   ((i, 'customer ' + str(i % 1000), i * 1.25, datetime.date(2020, 1, 1 + i % 28), None) for i in range(row_count)))
+    db.commit()
+
+    return db
+
+
+def fetchmany_loop(db, batch_size):
+    writer = XLSXWriter.Writer()
+    writer.sheetAdd('Orders')
+    cursor = db.execute('SELECT * FROM orders')
+    writer.writeSheetRow([column[0] for column in cursor.description])
+    rows = cursor.fetchmany(batch_size)
+    while rows:
+        for row in rows:
+            writer.writeSheetRow(row)
+        rows = cursor.fetchmany(batch_size)
+    writer.saveAs("test.xlsx")
+
+
+def from_cursor(db, batch_size):
+    writer = XLSXWriter.Writer()
+    writer.sheetAdd('Orders')
+    writer.writeSheetFromCursor(db.execute('SELECT * FROM orders'), batch_size)
+    writer.saveAs("test.xlsx")
+
+
+def check_non_finite():
+    # REAL columns get the default style, inf/-inf/nan must not reach <v> on the number fast path
+    db = sqlite3.connect(':memory:')
+    db.execute('CREATE TABLE readings (value REAL)')
+    db.executemany('INSERT INTO readings VALUES (?)', [(1.5,), (float('inf'),), (float('-inf'),), (float('nan'),)])
+    writer = XLSXWriter.Writer()
+    writer.sheetAdd('Readings')
+    writer.writeSheetFromCursor(db.execute('SELECT value FROM readings'))
+    writer.saveAs("test.xlsx")
+    db.close()
+
+    with zipfile.ZipFile("test.xlsx") as zip:
+        values = re.findall(r'<v>([^<]*)</v>', zip.read('xl/worksheets/sheet1.xml').decode())
+    if values != ['1.5']:
+        raise Exception("Error: " + "non-finite values were written as numbers: " + ', '.join(values) + ".")
+
+
+def main():
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else XLSXWriter.Writer.CURSOR_BATCH_SIZE
+    directory = tempfile.mkdtemp(prefix='xlsx_cursor_')
+    filename = os.path.join(directory, 'orders.db')
+    db = create_database(filename, row_count)
+    check_non_finite()
+
+    for function in (fetchmany_loop, from_cursor):
+        start = getTime()
+        function(db, batch_size)
+        print("rows: {}. {}: {} ms".format(row_count, function.__name__, getTime() - start))
+
+    db.close()
+    os.remove(filename)
+    os.rmdir(directory)
+    os.remove("test.xlsx")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+import os
+import sys
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import XLSXWriter
+
+
+def getTime():
+    return round(time.time() * 1000)
+
+
+def main():
+    testFilePath = "test.xlsx"
+    rows_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    threads = [int(t) for t in sys.argv[2].split(',')] if len(sys.argv) > 2 else [0, 2, 4, os.cpu_count() or 1]
+    row = [1, 2.5, 'text', 4, 5, 6, 7, 8, 9, 0]
+
+    for thread_count in threads:
+        writer = XLSXWriter.Writer()
+        writer.sheetAdd('Sheet1')
+        writer.writeSheetRows(row for i in range(rows_count))
+        if thread_count:
+            writer.setCompressThreads(thread_count)
+
+        start = getTime()
+        writer.saveAs(testFilePath)
+        end = getTime() - start
+
+        sheet_info = zipfile.ZipFile(testFilePath).getinfo('xl/worksheets/sheet1.xml')
+        print("rows: {}. threads: {}. Compress time: {} ms. Size: {} -> {} bytes".format(
+            rows_count, thread_count or 'zipfile', end, sheet_info.file_size, sheet_info.compress_size))
+
+    os.remove(testFilePath)
+
+
+if __name__ == '__main__':
+    main()
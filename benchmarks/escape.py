@@ -0,0 +1,66 @@
+import os
+import random
+import sys
+import time
+from functools import lru_cache
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from XLSXWriter.XLSXWriter import xml_escape
+
+
+def getTime():
+    return round(time.time() * 1000)
+
+
+def legacy_xmlspecialchars(val):
+    badchars = "\x00\x01\x02\x03\x04\x05\x06\x07\x08\x0b\x0c\x0e\x0f\x10\x11\x12\x13\x14\x15\x16\x17\x18\x19\x1a\x1b\x1c\x1d\x1e\x1f\x7f"
+    goodchars = "                              "
+
+    return val.translate(str.maketrans(badchars, goodchars)) \
+        .replace("&", "&amp;") \
+        .replace('"', "&quot;") \
+        .replace("'", "&#039;") \
+        .replace("<", "&lt;") \
+        .replace(">", "&gt;") \
+        .replace("\n", "&#10;")
+
+
+def corpora(count):
+    rnd = random.Random(1)
+    words = ['invoice', 'customer', 'total', 'delivered', 'pending', 'Moscow', 'order', 'item', 'price', 'north']
+    cyrillic = ['счёт', 'клиент', 'итого', 'доставлен', 'ожидание', 'Москва', 'заказ', 'товар', 'цена', 'север']
+    statuses = ['New', 'In progress', 'Done', 'Cancelled', 'On hold']
+
+    return [
+        ('ascii', [' '.join(rnd.choice(words) for w in range(rnd.randint(1, 6))) for i in range(count)]),
+        ('special', [rnd.choice(words) + ' & ' + rnd.choice(words) + ' <"' + str(i) + '">\n' for i in range(count)]),
+        ('cyrillic', [' '.join(rnd.choice(cyrillic) for w in range(rnd.randint(1, 6))) for i in range(count)]),
+        ('low-cardinality', [rnd.choice(statuses) for i in range(count)]),
+    ]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    functions = [
+        ('legacy', lambda: legacy_xmlspecialchars),
+        ('xml_escape', lambda: xml_escape),
+        ('xml_escape+cache', lambda: lru_cache(maxsize=4096)(xml_escape)),
+    ]
+
+    for name, values in corpora(count):
+        expected = list(map(legacy_xmlspecialchars, values))
+        for function_name, factory in functions:
+            escape = factory()
+            start = getTime()
+            result = list(map(escape, values))
+            end = getTime() - start
+
+            if result != expected:
+                raise Exception("Error: " + function_name + " output differs on " + name)
+
+            print("{}: {} values. {}: {} ms".format(name, count, function_name, end))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import XLSXWriter
+
+
+def getTime():
+    return round(time.time() * 1000)
+
+
+def main():
+    testFilePath = "test.xlsx"
+    merge_count = int(sys.argv[1]) if len(sys.argv) > 1 else 300000
+
+    writer = XLSXWriter.Writer()
+    writer.sheetAdd('Pivot')
+    writer.writeSheetRows([['group', 'value', 'total']] * (merge_count // 2))
+
+    start = getTime()
+    for i in range(0, merge_count // 2):
+        writer.markMergedCell('Pivot', (i, 0), (i, 1))
+        writer.markMergedCell('Pivot', (i, 2), (i, 4))
+    end = getTime() - start
+
+    rows = list(range(merge_count // 2))
+    random.Random(merge_count).shuffle(rows)
+    merged = XLSXWriter.XLSXWriter.MergedCells()
+    start = getTime()
+    for i in rows:
+        merged.add(i, 0, i, 1)
+        merged.add(i, 2, i, 4)
+    shuffled = getTime() - start
+
+    tracemalloc.start()
+    merged = XLSXWriter.XLSXWriter.MergedCells()
+    for i in range(0, merge_count // 2):
+        merged.add(i, 0, i, 1)
+        merged.add(i, 2, i, 4)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    strings = []
+    for i in range(0, merge_count // 2):
+        strings.append(writer.xlsCell(i, 0) + ':' + writer.xlsCell(i, 1))
+        strings.append(writer.xlsCell(i, 2) + ':' + writer.xlsCell(i, 4))
+    strings_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print("merges: {}. markMergedCell: {} ms, in random row order: {} ms. Memory: {:.1f} MiB (list of strings: {:.1f} MiB)".format(
+        merge_count, end, shuffled, memory / 1048576, strings_memory / 1048576))
+
+    start = getTime()
+    writer.saveAs(testFilePath)
+    print("merges: {}. saveAs: {} ms".format(merge_count, getTime() - start))
+
+    os.remove(testFilePath)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import XLSXWriter
+
+try:
+    import numpy
+    import pandas
+except ImportError:
+    pandas = None
+
+WORDS = ['invoice', 'customer', 'total', 'delivered', 'pending', 'Moscow', 'order', 'item', 'price', 'north',
+         'счёт', 'клиент', 'итого', 'R&D', '<draft>', '"quoted"']
+SIZES = [1000, 10000, 100000, 1000000]
+MEMORY_WORKLOADS = ['numeric', 'strings', 'wide']
+# a chunk is held as row strings, joined and encoded at once, with up to 2 bytes per character for non-Latin text
+MEMORY_ALLOWANCE = 16 * XLSXWriter.Writer.ROWS_CHUNK_LENGTH
+
+
+def numeric(writer, cells):
+    row_count = cells // 10
+    writer.sheetAdd('Sheet1')
+    writer.writeSheetRows([i, i * 0.5, i % 7, -i, 1.25, i * 3, 0, i % 100, 2.5e10, i] for i in range(row_count))
+
+    return row_count
+
+
+def dataframe(writer, cells):
+    # the numeric rows as a DataFrame, so both workloads compare the row path with the column path
+    row_count = cells // 10
+    i = numpy.arange(row_count)
+    df = pandas.DataFrame({'a': i, 'b': i * 0.5, 'c': i % 7, 'd': -i, 'e': numpy.full(row_count, 1.25), 'f': i * 3,
+                           'g': numpy.zeros(row_count, dtype=numpy.int64), 'h': i % 100, 'i': numpy.full(row_count, 2.5e10), 'j': i})
+    writer.sheetAdd('Sheet1')
+    writer.writeDataFrame(df, header=False)
+
+    return row_count
+
+
+def strings(writer, cells):
+    row_count = cells // 10
+    count = len(WORDS)
+    writer.sheetAdd('Sheet1')
+    writer.writeSheetRows([WORDS[(i + c) % count] + ' ' + str(i % 1000) for c in range(10)] for i in range(row_count))
+
+    return row_count
+
+
+def dates(writer, cells):
+    row_count = cells // 6
+    start = datetime.datetime(2000, 1, 1)
+    date = writer.addStyle({'format': 'date'})
+    date_time = writer.addStyle({'format': 'datetime'})
+    writer.sheetAdd('Sheet1')
+    rows = ([(start + datetime.timedelta(hours=i)).strftime('%Y-%m-%d'), (start + datetime.timedelta(minutes=i)).strftime('%Y-%m-%d %H:%M:%S'),
+             start + datetime.timedelta(minutes=i), datetime.date(2000 + i % 50, 1 + i % 12, 1 + i % 28), '1999-12-31', i]
+            for i in range(row_count))
+    writer.writeSheetRows(rows, styles=[date, date_time, date_time, date, date, 0])
+
+    return row_count
+
+
+def styled(writer, cells):
+    row_count = cells // 10
+    formats = ['integer', 'price', 'dollar', 'euro', '0.00', 'string']
+    fills = ['#ffffff', '#b3d8ff', '#ffd8b3', '#d8ffb3']
+    handles = [writer.addStyle({'format': formats[i % len(formats)], 'fill': fills[i % len(fills)], 'font-style': 'bold' if i % 3 else '',
+                                'border': 'left,right' if i % 2 else 'top', 'halign': 'center'}) for i in range(24)]
+    writer.sheetAdd('Sheet1')
+    for i in range(row_count):
+        writer.writeSheetRow([i, i * 0.5, i % 7, -i, 1.25, i * 3, 0, i % 100, 2.5, i], styles=[handles[(i + c) % 24] for c in range(10)])
+
+    return row_count
+
+
+def wide(writer, cells):
+    row_count = max(cells // 1000, 1)
+    writer.sheetAdd('Sheet1')
+    writer.writeSheetRows([i + c if c % 2 else WORDS[c % len(WORDS)] for c in range(1000)] for i in range(row_count))
+
+    return row_count
+
+
+def multisheet(writer, cells):
+    sheet_count = 10
+    row_count = max(cells // 10 // sheet_count, 1)
+    for s in range(sheet_count):
+        writer.sheetAdd('Sheet' + str(s + 1))
+        writer.writeSheetRows([i, i * 0.5, 'sheet' + str(s), -i, 1.25, i * 3, 0, i % 100, 2.5, i] for i in range(row_count))
+
+    return row_count * sheet_count
+
+
+WORKLOADS = {
+    'numeric': numeric,
+    'strings': strings,
+    'dates': dates,
+    'styled': styled,
+    'wide': wide,
+    'multisheet': multisheet,
+}
+if pandas is not None:
+    WORKLOADS['dataframe'] = dataframe
+
+
+def rss_peak():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def measure(phases, name, function, trace):
+    if trace:
+        tracemalloc.reset_peak()
+        traced_start = tracemalloc.get_traced_memory()[0]
+
+    start = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - start
+
+    phase = {'seconds': round(seconds, 6), 'rss_peak': rss_peak()}
+    if trace:
+        phase['tracemalloc_peak'] = tracemalloc.get_traced_memory()[1] - traced_start
+    phases[name] = phase
+
+    return result
+
+
+def run_case(workload, cells, trace):
+    fd, filename = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+
+    if trace:
+        tracemalloc.start()
+
+    phases = {}
+    writer = XLSXWriter.Writer()
+    row_count = measure(phases, 'write', lambda: WORKLOADS[workload](writer, cells), trace)
+    measure(phases, 'save', lambda: writer.saveAs(filename), trace)
+    del writer
+
+    if trace:
+        tracemalloc.stop()
+
+    file_size = os.path.getsize(filename)
+    os.remove(filename)
+
+    seconds = phases['write']['seconds'] + phases['save']['seconds']
+    for phase in phases.values():
+        phase['rows_per_sec'] = round(row_count / phase['seconds']) if phase['seconds'] else None
+
+    return {'workload': workload, 'cells': cells, 'rows': row_count, 'file_size': file_size,
+            'seconds': round(seconds, 6), 'rows_per_sec': round(row_count / seconds) if seconds else None, 'phases': phases}
+
+
+def spawn_case(workload, cells, trace):
+    command = [sys.executable, os.path.abspath(__file__), '--case', workload, str(cells)]
+    if trace:
+        command.append('--tracemalloc')
+
+    output = subprocess.run(command, check=True, stdout=subprocess.PIPE).stdout
+
+    return json.loads(output)
+
+
+def run_suite(workloads, sizes, trace):
+    results = []
+    for workload in workloads:
+        for cells in sizes:
+            result = spawn_case(workload, cells, False)
+            if trace:
+                traced = spawn_case(workload, cells, True)
+                for name, phase in traced['phases'].items():
+                    result['phases'][name]['tracemalloc_peak'] = phase['tracemalloc_peak']
+
+            write, save = result['phases']['write'], result['phases']['save']
+            print("{}: {} cells. {} rows/sec. write: {} s, {} traced. save: {} s, {} traced. RSS: {}".format(
+                workload, cells, result['rows_per_sec'], write['seconds'], format_size(write.get('tracemalloc_peak')),
+                save['seconds'], format_size(save.get('tracemalloc_peak')), format_size(save['rss_peak'])))
+            results.append(result)
+
+    return results
+
+
+def format_size(size):
+    return 'n/a' if size is None else '{:.3f} MiB'.format(size / 1048576)
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    previous = {(r['workload'], r['cells']): r for r in baseline['results']}
+    for result in results:
+        base = previous.get((result['workload'], result['cells']))
+        if base is None:
+            continue
+
+        name = '{}/{}'.format(result['workload'], result['cells'])
+        if base['rows_per_sec'] and result['rows_per_sec'] < base['rows_per_sec'] * (1 - threshold):
+            regressions.append('{}: {} rows/sec, baseline {}'.format(name, result['rows_per_sec'], base['rows_per_sec']))
+
+        for phase_name, phase in result['phases'].items():
+            base_peak = base['phases'].get(phase_name, {}).get('tracemalloc_peak')
+            peak = phase.get('tracemalloc_peak')
+            if base_peak is not None and peak is not None and peak > base_peak * (1 + threshold) + 65536:
+                regressions.append('{} {}: peak {}, baseline {}'.format(name, phase_name, format_size(peak), format_size(base_peak)))
+
+    return regressions
+
+
+def check_memory(results, threshold, limit=0):
+    # rows are written in chunks of a bounded encoded length, so the traced peak must not depend on the row count or the row width
+    failures = []
+    runs = sorted((r for r in results if r['workload'] in MEMORY_WORKLOADS), key=lambda r: r['cells'])
+    for result in runs:
+        for phase_name, phase in result['phases'].items():
+            peak = phase.get('tracemalloc_peak')
+            if limit and peak is not None and peak > limit:
+                failures.append('{}/{} {}: peak {} exceeds {}'.format(result['workload'], result['cells'], phase_name, format_size(peak), format_size(limit)))
+
+    if len(runs) < 2:
+        return failures
+
+    for phase_name in runs[0]['phases']:
+        peaks = [(r['phases'][phase_name].get('tracemalloc_peak'), r) for r in runs if r['phases'][phase_name].get('tracemalloc_peak') is not None]
+        if not peaks:
+            continue
+
+        base_peak, smallest = min(peaks, key=lambda p: p[0])
+        allowed = base_peak * (1 + threshold) + MEMORY_ALLOWANCE
+        for peak, result in peaks:
+            if peak > allowed:
+                failures.append('{}/{} {}: peak grows with size or width, {} here, {} for {}/{}'.format(
+                    result['workload'], result['cells'], phase_name, format_size(peak), format_size(base_peak), smallest['workload'], smallest['cells']))
+
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='XLSXWriter throughput and memory benchmarks')
+    parser.add_argument('--workloads', default=','.join(WORKLOADS), help='comma-separated: ' + ', '.join(WORKLOADS))
+    parser.add_argument('--sizes', default=','.join(map(str, SIZES)), help='comma-separated cell counts, e.g. 1000,10000000')
+    parser.add_argument('--output', help='write results as JSON')
+    parser.add_argument('--compare', help='baseline JSON produced by --output')
+    parser.add_argument('--threshold', type=float, default=0.1, help='allowed relative regression (default 0.1)')
+    parser.add_argument('--memory-limit', type=float, default=0,
+                        help='max traced peak in MiB for the ' + ', '.join(MEMORY_WORKLOADS) + ' workloads (default: no absolute limit)')
+    parser.add_argument('--no-tracemalloc', action='store_true', help='skip the traced runs')
+    parser.add_argument('--case', nargs=2, help=argparse.SUPPRESS)
+    parser.add_argument('--tracemalloc', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(args.case[0], int(args.case[1]), args.tracemalloc)))
+        return 0
+
+    trace = not args.no_tracemalloc
+    results = run_suite(args.workloads.split(','), [int(float(s)) for s in args.sizes.split(',')], trace)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'python': platform.python_version(), 'implementation': platform.python_implementation(),
+                       'platform': platform.platform(), 'created': datetime.datetime.now().isoformat(timespec='seconds'),
+                       'results': results}, f, indent=1)
+
+    failures = []
+    if args.compare:
+        with open(args.compare) as f:
+            failures += compare(results, json.load(f), args.threshold)
+    if trace:
+        failures += check_memory(results, args.threshold, args.memory_limit * 1048576)
+
+    for failure in failures:
+        print('REGRESSION: ' + failure)
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+import os
+import random
+import sys
+import threading
+import time
+import zipfile
+import xml.etree.ElementTree as ElementTree
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import XLSXWriter
+
+NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
+
+def getTime():
+    return round(time.time() * 1000)
+
+
+def producer(writer, sheet_name, producer_id, batches, batch_size, ordered):
+    rnd = random.Random(sheet_name + str(producer_id))
+    for seq in batches:
+        time.sleep(rnd.random() / 1000)
+        writer.submit(sheet_name, [[seq * batch_size + i, producer_id, seq] for i in range(batch_size)], seq=seq if ordered else None)
+
+
+def read_rows(zip, xmlname):
+    rows = []
+    with zip.open('xl/worksheets/' + xmlname) as f:
+        for _, element in ElementTree.iterparse(f):
+            if element.tag != NS + 'row':
+                continue
+
+            cells = element.findall(NS + 'c')
+            if cells:
+                r = element.get('r')
+                refs = [c.get('r') for c in cells]
+                if refs != ['A' + r, 'B' + r, 'C' + r]:
+                    raise Exception("Error: " + "row " + r + " has cells " + ', '.join(refs) + ".")
+                rows.append((int(r), [int(c.find(NS + 'v').text) for c in cells]))
+            element.clear()
+
+    return rows
+
+
+def check_sheet(rows, sheet_name, producers, batch_count, batch_size, ordered):
+    total = batch_count * batch_size
+    if len(rows) != total:
+        raise Exception("Error: " + sheet_name + " has " + str(len(rows)) + " rows, " + str(total) + " were written.")
+    if [r for r, _ in rows] != list(range(1, total + 1)):
+        raise Exception("Error: " + sheet_name + " row numbers are not contiguous.")
+
+    if ordered:
+        if [values[0] for _, values in rows] != list(range(total)):
+            raise Exception("Error: " + sheet_name + " rows are out of order.")
+        return
+
+    # without seq batches land in arrival order, but every batch stays whole and every producer's batches keep their order
+    last_seq = {}
+    for b in range(batch_count):
+        batch = [values for _, values in rows[b * batch_size:(b + 1) * batch_size]]
+        seq, producer_id = batch[0][2], batch[0][1]
+        if batch != [[seq * batch_size + i, producer_id, seq] for i in range(batch_size)]:
+            raise Exception("Error: " + sheet_name + " batch " + str(seq) + " is interleaved with other rows.")
+        if not 0 <= seq < batch_count or seq % producers != producer_id:
+            raise Exception("Error: " + sheet_name + " has an unknown batch " + str(seq) + ".")
+        if seq <= last_seq.get(producer_id, -1):
+            raise Exception("Error: " + sheet_name + " batches of producer " + str(producer_id) + " are out of order or repeated.")
+        last_seq[producer_id] = seq
+
+
+def main():
+    testFilePath = "test.xlsx"
+    producers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    batch_count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    batch_size = 500
+    sheets = [('Sheet1', True), ('Sheet2', False)]
+
+    start = getTime()
+
+    writer = XLSXWriter.ThreadedWriter(queue_size=16, max_pending=producers)
+    threads = [threading.Thread(target=producer, args=(writer, sheet, p, range(p, batch_count, producers), batch_size, ordered))
+               for sheet, ordered in sheets for p in range(producers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.saveAs(testFilePath)
+
+    end = getTime() - start
+
+    with zipfile.ZipFile(testFilePath) as zip:
+        for i, (sheet, ordered) in enumerate(sheets):
+            check_sheet(read_rows(zip, 'sheet' + str(i + 1) + '.xml'), sheet, producers, batch_count, batch_size, ordered)
+
+    os.remove(testFilePath)
+
+    gil = sys._is_gil_enabled() if hasattr(sys, '_is_gil_enabled') else True
+    print("producers: {}x{}. rows: {}. GIL: {}. Time: {} ms. Output checked".format(
+        producers, len(sheets), batch_count * batch_size * len(sheets), 'enabled' if gil else 'disabled', end))
+
+
+if __name__ == '__main__':
+    main()
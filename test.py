@@ -17,6 +17,7 @@ def main():
         os.remove(testFilePath)
 
     rows_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    bulk = len(sys.argv) > 2 and sys.argv[2] == 'bulk'
     row = [1, 2, 3, 4, 5, 6, 7, 8, 9, 0]
 
     start = getTime()
@@ -24,8 +25,11 @@ def main():
     writer = XLSXWriter.Writer()
     writer.sheetAdd('Sheet1')
 
-    for i in range(rows_count):
-        writer.writeSheetRow(row)
+    if bulk:
+        writer.writeSheetRows(row for i in range(rows_count))
+    else:
+        for i in range(rows_count):
+            writer.writeSheetRow(row)
 
     writer.saveAs(testFilePath)
 